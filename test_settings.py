@@ -50,3 +50,4 @@ BACKEND_URL = 'http://localhost'
 TYPEPAD_COOKIES = {}
 BATCH_REQUESTS = True
 FRONTEND_CACHING = True
+LONG_TERM_CACHE_PERIOD = 60 * 60 * 24
@@ -159,12 +159,7 @@ def _create_django_user(request, tp_user):
         if log.isEnabledFor(logging.DEBUG):
             log.debug('Is our unmapped user one of admins %r?',
                 [x.target.url_id for x in request.group.admins()])
-        for admin_rel in request.group.admins():
-            admin = admin_rel.target
-            log.debug('Is user %s also %s?', tp_user.url_id, admin.url_id)
-            if admin.url_id == tp_user.url_id:
-                is_admin = True
-                break
+        is_admin = request.group.is_admin(tp_user)
 
     if autocreate == 'admin' and not is_admin:
         log.debug('Only admins are auto-created and %s is not an admin; not creating', tp_user.url_id)
@@ -27,15 +27,837 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+from bisect import bisect_right
+import cgi
+import copy
+import cPickle as pickle
 import logging
+import Queue
+import threading
+import time
+from urllib import urlencode
+from urlparse import urlparse
+
+from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from oauth import oauth
 
 import typepad
 from typepadapp.middleware.debug import RequestStatTracker
+from typepadapp.utils.cachepolicy import cache_policy
+from typepadapp.utils.compression import compress, decompress
 
 log = logging.getLogger('typepadapp.cache')
 
 
+class LocalCache(object):
+
+    """A small in-process cache for values that are read on nearly every
+    request.
+
+    Entries expire after ``timeout`` seconds. Once ``max_entries`` entries
+    are held, the least recently used ``1/cull_frequency`` of them are
+    culled, much as Django's own local memory backend does. Values are
+    pickled on the way in and out, so callers never share an instance
+    with another thread.
+
+    """
+
+    def __init__(self, max_entries, timeout, cull_frequency=4):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.cull_frequency = cull_frequency
+        self._data = {}
+        self._lock = threading.Lock()
+        self._tick = 0
+
+    def get(self, key):
+        self._lock.acquire()
+        try:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[key]
+                return None
+            self._tick += 1
+            entry[1] = self._tick
+            value = entry[2]
+        finally:
+            self._lock.release()
+        return pickle.loads(value)
+
+    def get_many(self, keys):
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set(self, key, value):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._lock.acquire()
+        try:
+            if key not in self._data and len(self._data) >= self.max_entries:
+                self._cull()
+            self._tick += 1
+            self._data[key] = [time.time() + self.timeout, self._tick, value]
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        self._lock.acquire()
+        try:
+            self._data.pop(key, None)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._data.clear()
+        finally:
+            self._lock.release()
+
+    def _cull(self):
+        by_use = sorted(self._data.iteritems(), key=lambda item: item[1][1])
+        for key, entry in by_use[:max(1, len(by_use) / self.cull_frequency)]:
+            del self._data[key]
+
+
+local_cache = None
+if getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 0):
+    local_cache = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES,
+        getattr(settings, 'LOCAL_CACHE_TIMEOUT', 30))
+
+
+class CacheStats(object):
+
+    """Counts caching events, both for the life of the process and for the
+    request being handled in the current thread."""
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def current(self):
+        """The counts for the request being handled in the current
+        thread."""
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            counts = self._local.counts = {}
+        return counts
+
+    def incr(self, name, count=1):
+        self._lock.acquire()
+        try:
+            self.totals[name] = self.totals.get(name, 0) + count
+        finally:
+            self._lock.release()
+        current = self.current
+        current[name] = current.get(name, 0) + count
+
+    def reset(self, **kwargs):
+        """Resets the counts for the current thread's request."""
+        self._local.counts = {}
+
+
+stats = CacheStats()
+request_started.connect(stats.reset)
+
+
+OBJECT_SCHEMA_VERSION = 1
+"""The version of the layout of the TypePad objects cached by this module.
+
+The version is part of every object cache key, so when the cached data of
+objects changes incompatibly, incrementing it leaves the old entries
+behind.
+
+"""
+
+
+def object_cache_key(namespace, id):
+    """Returns the cache key for the TypePad object identified by ``id`` in
+    the cache namespace ``namespace`` (see `make_tpobject_cache_namespace`).
+
+    """
+    return 'objectcache:%d:%s:%s' % (OBJECT_SCHEMA_VERSION, namespace, id)
+
+
+def class_cache_namespace(cls):
+    """Returns the cache namespace of the objects of the `TypePadObject`
+    class ``cls``, without constructing one."""
+    namespace = getattr(cls, 'cache_namespace', None)
+    if isinstance(namespace, basestring):
+        return namespace
+    return cls.__name__
+
+
+_object_classes = {}
+
+
+def _object_class(path):
+    try:
+        return _object_classes[path]
+    except KeyError:
+        module, name = path.rsplit('.', 1)
+        cls = getattr(__import__(module, {}, {}, [name]), name)
+        _object_classes[path] = cls
+        return cls
+
+
+def encode_object(obj):
+    """Returns the compact form in which the `TypePadObject` ``obj`` is
+    cached: its class and location, and its API data pickled as a plain
+    dictionary.
+
+    Objects are cached as their API data rather than pickled whole so that
+    cached entries don't depend on the layout of their classes. Rebuilding
+    an object with `from_dict()` costs more than unpickling it whole (see
+    the ``tpcachebench`` command). The data stays a string so objects built
+    from entries in the in-process cache can't change those entries.
+
+    """
+    cls = type(obj)
+    data = pickle.dumps(obj.to_dict(), pickle.HIGHEST_PROTOCOL)
+    return ('%s.%s' % (cls.__module__, cls.__name__), obj._location, data)
+
+
+def decode_object(value):
+    """Rebuilds a `TypePadObject` from the ``value`` returned by
+    `encode_object()`, returning ``None`` if it can't be rebuilt."""
+    try:
+        path, location, data = value
+        obj = _object_class(path).from_dict(pickle.loads(data))
+    except Exception, exc:
+        log.warning("Could not decode cached object: %s" % str(exc))
+        return None
+    obj._location = location
+    obj._delivered = True
+    return obj
+
+
+def _encode(value):
+    if isinstance(value, typepad.TypePadObject):
+        return encode_object(value)
+    return value
+
+
+def _decode(key, value):
+    if isinstance(value, tuple) and key.startswith('objectcache:'):
+        return decode_object(value)
+    return value
+
+
+def _is_local(key):
+    return local_cache is not None and key.startswith('objectcache:')
+
+
+def key_namespace(key):
+    """Returns the namespace of `CACHE_POLICIES` the cache key ``key``
+    belongs to, or ``None`` if it belongs to none.
+
+    Objects belong to their cache namespace (such as ``Asset`` or
+    ``User``) and lists to their endpoint's noun and link (such as
+    ``groups/events``).
+
+    """
+    if key.startswith('objectcache:'):
+        return key.split(':', 3)[2]
+    if key.startswith('listcache:'):
+        url = key.split(':', 2)[2].rsplit(':', 1)[0]
+        parts = list_namespace(url).split('/')
+        return '/'.join(parts[:1] + parts[2:])
+    return None
+
+
+def _policy(key):
+    namespace = key_namespace(key)
+    if namespace is None:
+        return cache, None
+    return cache_policy(namespace)
+
+
+def _by_policy(keys, timeout=None):
+    """Groups the cache keys ``keys`` by the cache backend and timeout they
+    are stored with, returning a dictionary of lists of keys keyed on
+    (backend, timeout) pairs. An explicit ``timeout`` overrides the
+    timeouts of the policies."""
+    groups = {}
+    for key in keys:
+        backend, policy_timeout = _policy(key)
+        if timeout is not None:
+            policy_timeout = timeout
+        groups.setdefault((backend, policy_timeout), []).append(key)
+    return groups
+
+
+def cache_get(key):
+    """Returns the cached value for ``key``, consulting the in-process
+    cache first for object keys."""
+    if _is_local(key):
+        value = local_cache.get(key)
+        if value is not None:
+            return _decode(key, value)
+    backend, timeout = _policy(key)
+    value = decompress(backend.get(key))
+    if value is not None and _is_local(key):
+        local_cache.set(key, value)
+    return _decode(key, value)
+
+
+def cache_get_many(keys):
+    """Returns a dictionary of the cached values found for ``keys``,
+    consulting the in-process cache first for object keys."""
+    result = {}
+    remote_keys = []
+    for key in keys:
+        if _is_local(key):
+            value = local_cache.get(key)
+            if value is not None:
+                result[key] = value
+                continue
+        remote_keys.append(key)
+    found = {}
+    for (backend, timeout), backend_keys in _by_policy(remote_keys).iteritems():
+        found.update(backend.get_many(backend_keys))
+    for key, value in found.iteritems():
+        value = decompress(value)
+        if value is not None and _is_local(key):
+            local_cache.set(key, value)
+        result[key] = value
+    for key, value in result.items():
+        value = _decode(key, value)
+        if value is None:
+            del result[key]
+        else:
+            result[key] = value
+    return result
+
+
+_writes = threading.local()
+
+
+def cache_set(key, value, timeout=None):
+    """Stores ``value`` in the cache under ``key``.
+
+    While cache writes are being buffered (see `buffer_cache_writes()`),
+    the value is held until `flush_cache_writes()` is called.
+
+    """
+    value = _encode(value)
+    buffered = getattr(_writes, 'buffered', None)
+    if buffered is not None:
+        buffered.setdefault(timeout, {})[key] = value
+        return
+
+    if _is_local(key):
+        local_cache.set(key, value)
+    backend, policy_timeout = _policy(key)
+    if timeout is None:
+        timeout = policy_timeout
+    value = compress(value)
+    if timeout is None:
+        backend.set(key, value)
+    else:
+        backend.set(key, value, timeout)
+
+
+def cache_set_many(values, timeout=None):
+    """Stores the dictionary of ``values`` in the cache, keyed on their
+    cache keys, with one multiple-key set for each cache backend and
+    timeout used where the cache backend supports it."""
+    values = dict([(key, _encode(value)) for key, value in values.iteritems()])
+    for key, value in values.iteritems():
+        if _is_local(key):
+            local_cache.set(key, value)
+
+    for (backend, timeout), keys in _by_policy(values.keys(), timeout).iteritems():
+        backend_values = dict([(key, compress(values[key])) for key in keys])
+        if hasattr(backend, 'set_many'):
+            if timeout is None:
+                backend.set_many(backend_values)
+            else:
+                backend.set_many(backend_values, timeout)
+            continue
+        for key, value in backend_values.iteritems():
+            if timeout is None:
+                backend.set(key, value)
+            else:
+                backend.set(key, value, timeout)
+
+
+def buffer_cache_writes():
+    """Begins holding cache writes made with `cache_set()` in the current
+    thread, so they can be made together by `flush_cache_writes()`.
+
+    Calls may be nested; writes are only made when the outermost buffer
+    is flushed.
+
+    """
+    _writes.depth = getattr(_writes, 'depth', 0) + 1
+    if _writes.depth == 1:
+        _writes.buffered = {}
+        _writes.references = {}
+
+
+def flush_cache_writes():
+    """Makes all the cache writes buffered since `buffer_cache_writes()`
+    was called, with one multiple-key set for each cache timeout used.
+
+    The list references recorded meanwhile with `record_list_references()`
+    are merged into the cache with one more multiple-key get and set.
+
+    """
+    _writes.depth -= 1
+    if _writes.depth > 0:
+        return
+
+    buffered, _writes.buffered = _writes.buffered, None
+    references, _writes.references = _writes.references, None
+    for timeout, values in buffered.iteritems():
+        log.debug("setting keys %s" % ", ".join(values.keys()))
+        cache_set_many(values, timeout)
+    if references:
+        _merge_list_references(references)
+
+
+def _soft_timeout():
+    return getattr(settings, 'CACHE_SOFT_TIMEOUT', None)
+
+
+def fresh_key(key):
+    """Returns the key of the marker that is present while the value cached
+    under ``key`` is fresh."""
+    return 'fresh:%s' % key
+
+
+def mark_fresh(key):
+    """Marks the value cached under ``key`` as fresh for the
+    `CACHE_SOFT_TIMEOUT` period, if stale-while-revalidate caching is on."""
+    timeout = _soft_timeout()
+    if timeout:
+        cache_set(fresh_key(key), True, timeout)
+
+
+def list_namespace(url):
+    """Returns the namespace of the cached lists for the API endpoint
+    ``url``.
+
+    The namespace is the object and link the list belongs to (such as
+    ``groups/<id>/events`` or ``users/<id>/favorites``), so all the
+    filtered views of one list, like a user's notifications for each
+    group, share the same namespace.
+
+    """
+    path = urlparse(url)[2]
+    if path.endswith('.json'):
+        path = path[:-len('.json')]
+    return '/'.join(path.strip('/').split('/')[:3])
+
+
+def generation_key(namespace):
+    """Returns the key of the cached generation counter for the list
+    namespace ``namespace``."""
+    return 'generation:%s' % namespace
+
+
+def link_cache_key(noun, id, link):
+    """Returns the cache key that invalidates the cached lists of the link
+    ``link`` of the API object identified by ``id`` of the kind ``noun``
+    (such as ``link_cache_key('groups', group.url_id, 'events')``),
+    without constructing the object or the list."""
+    return generation_key('/'.join((noun, id, link)))
+
+
+def list_references_key(id):
+    """Returns the cache key that invalidates the cached lists that contain
+    the API object identified by the XID ``id``, either as an item or as an
+    item's embedded object."""
+    return 'listrefs:%s' % id
+
+
+def record_list_references(namespace, ids):
+    """Records that the lists of the namespace ``namespace`` contain the
+    objects identified by the XIDs ``ids``, for `list_references_key()`.
+
+    While cache writes are being buffered (see `buffer_cache_writes()`),
+    the references are held until `flush_cache_writes()` is called.
+
+    References are kept on a best effort basis: concurrent fills of lists
+    containing the same object may lose one another's reference.
+
+    """
+    if not getattr(settings, 'LIST_CACHE_REFERENCES_MAX', 20) or not ids:
+        return
+    references = getattr(_writes, 'references', None)
+    if references is None:
+        _merge_list_references(dict([(id, [namespace]) for id in ids]))
+        return
+    for id in ids:
+        namespaces = references.setdefault(id, [])
+        if namespace not in namespaces:
+            namespaces.append(namespace)
+
+
+def _merge_list_references(references):
+    """Adds the namespaces in the dictionary ``references``, keyed on the
+    XIDs of the objects the namespaces' lists contain, to the references
+    already cached."""
+    limit = getattr(settings, 'LIST_CACHE_REFERENCES_MAX', 20)
+    keys = dict([(list_references_key(id), namespaces)
+        for id, namespaces in references.iteritems()])
+    found = cache_get_many(keys.keys())
+    updates = {}
+    for key, added in keys.iteritems():
+        namespaces = found.get(key) or []
+        added = [namespace for namespace in added if namespace not in namespaces]
+        if not added:
+            continue
+        # keep the most recent references
+        namespaces = namespaces + added
+        updates[key] = namespaces[max(0, len(namespaces) - limit):]
+    if updates:
+        cache_set_many(updates)
+
+
+def link_url(noun, id, link):
+    """Returns the URL of the API endpoint of the link ``link`` of the API
+    object identified by ``id`` of the kind ``noun``."""
+    return '%s/%s/%s/%s.json' % (settings.BACKEND_URL.rstrip('/'), noun, id, link)
+
+
+_alias_nouns = set()
+
+
+def alias_key(noun, alias):
+    """Returns the cache key of the canonical identifier of the API object
+    of the kind ``noun`` known by the alias ``alias``, such as the URL
+    identifier of the user with the username ``alias``."""
+    return 'alias:%s:%s' % (noun, alias)
+
+
+def record_alias(noun, alias, id):
+    """Records that the API object of the kind ``noun`` identified by ``id``
+    is also known by the alias ``alias``, so its cached values are looked
+    up and invalidated under the keys for ``id`` only."""
+    if alias and alias != id:
+        log.debug("recording alias %s of %s %s" % (alias, noun, id))
+        cache_set(alias_key(noun, alias), id, settings.LONG_TERM_CACHE_PERIOD)
+
+
+def _url_alias(url):
+    """Returns the noun and identifier of the object the API endpoint
+    ``url`` belongs to if objects of its kind have aliases, or ``None``."""
+    parts = urlparse(url)[2].strip('/').split('/')
+    if len(parts) < 2 or parts[0] not in _alias_nouns:
+        return None
+    id = parts[1]
+    if id.endswith('.json'):
+        id = id[:-len('.json')]
+    return parts[0], id
+
+
+def _canonical_url(url, id):
+    """Returns the API endpoint ``url`` rewritten to refer to its object by
+    the canonical identifier ``id``."""
+    noun, alias = _url_alias(url)
+    return url.replace('/%s/%s' % (noun, alias), '/%s/%s' % (noun, id), 1)
+
+
+def get_generation(namespace, found=None):
+    """Returns the current generation of the list namespace ``namespace``.
+
+    If provided, ``found`` is a dictionary of values already retrieved
+    from the cache. When no generation is cached yet, a new one is
+    started from the current time, so it can't collide with one that was
+    evicted from the cache.
+
+    """
+    key = generation_key(namespace)
+    if found is not None and key in found:
+        return int(found[key])
+    generation = cache.get(key)
+    if generation is None:
+        generation = int(time.time() * 1000)
+        if not cache.add(key, generation, settings.LONG_TERM_CACHE_PERIOD):
+            # someone else just started it
+            generation = cache.get(key, generation)
+    return int(generation)
+
+
+def bump_generation(namespace, delta=1):
+    """Invalidates all the lists cached in the namespace ``namespace`` by
+    moving on to its next generation.
+
+    Lists cached in the previous generation may still be served as stale
+    values under stale-while-revalidate caching; a ``delta`` of 2 skips
+    the previous generation so they can't be.
+
+    """
+    try:
+        cache.incr(generation_key(namespace), delta)
+    except ValueError:
+        # nothing has been cached in this namespace yet
+        pass
+
+
+def _leases_enabled():
+    return bool(getattr(settings, 'CACHE_FILL_LEASE_TIMEOUT', None))
+
+
+def lease_key(key):
+    """Returns the key of the lease held by the process filling the cache
+    key ``key``."""
+    return 'lease:%s' % key
+
+
+def acquire_lease(key):
+    """Tries to take the lease for filling the cache key ``key``, returning
+    whether it was acquired.
+
+    The lease is added to the shared cache, so only one process at a time
+    can hold it. It expires after `CACHE_FILL_LEASE_TIMEOUT` seconds if it
+    is not released sooner.
+
+    """
+    return bool(cache.add(lease_key(key), True,
+        settings.CACHE_FILL_LEASE_TIMEOUT))
+
+
+def release_leases(keys):
+    """Releases the leases taken with `acquire_lease()` for the cache
+    keys ``keys``."""
+    for key in keys:
+        cache.delete(lease_key(key))
+
+
+def cache_delete_many(keys):
+    """Deletes the cache keys ``keys``, with one multiple-key delete for
+    each cache backend used where the cache backend supports it."""
+    for key in keys:
+        if _is_local(key):
+            local_cache.delete(key)
+    for (backend, timeout), backend_keys in _by_policy(keys).iteritems():
+        if hasattr(backend, 'delete_many'):
+            backend.delete_many(backend_keys)
+            continue
+        for key in backend_keys:
+            backend.delete(key)
+
+
+_identities = threading.local()
+
+
+def _identity(key):
+    """Returns the object already requested under the object cache key
+    ``key`` while handling the current request, or ``None``."""
+    identities = getattr(_identities, 'objects', None)
+    if identities is None:
+        return None
+    return identities.get(key)
+
+
+def _remember(key, obj):
+    """Records that ``obj`` was requested under the object cache key
+    ``key``, so requesting it again while handling the current request
+    returns the same object instead of making another subrequest."""
+    identities = getattr(_identities, 'objects', None)
+    if identities is not None:
+        identities[key] = obj
+
+
+def _forget(key):
+    identities = getattr(_identities, 'objects', None)
+    if identities is not None:
+        identities.pop(key, None)
+
+
+def start_identity_map(**kwargs):
+    _identities.objects = {}
+request_started.connect(start_identity_map)
+
+
+def finish_identity_map(**kwargs):
+    _identities.objects = None
+request_finished.connect(finish_identity_map)
+
+
+_invalidations = threading.local()
+
+
+def invalidate(key, stale=True):
+    """Invalidates the value cached under ``key``.
+
+    A key of a list generation (see `generation_key()`) invalidates all
+    the lists of its namespace, and a key of `list_references_key()` all
+    the lists known to contain its object. When stale-while-revalidate
+    caching is enabled, the value is marked stale instead of deleted,
+    unless ``stale`` is false.
+
+    While a request is being handled, invalidations are collected and
+    made together when the next batch request is completed or when the
+    request is finished, whichever comes first. An invalidated object is
+    requested again if it's asked for later in the request.
+
+    """
+    _forget(key)
+    pending = getattr(_invalidations, 'pending', None)
+    if pending is None:
+        _invalidate({key: stale})
+    else:
+        pending[key] = pending.get(key, True) and stale
+
+
+def flush_invalidations():
+    """Makes the invalidations collected by `invalidate()` so far."""
+    pending = getattr(_invalidations, 'pending', None)
+    if pending:
+        _invalidations.pending = {}
+        _invalidate(pending)
+
+
+def _invalidate(keys):
+    references = [key for key in keys if key.startswith('listrefs:')]
+    if references:
+        found = cache_get_many(references)
+        keys = dict(keys)
+        for key in references:
+            stale = keys.pop(key)
+            for namespace in found.get(key) or ():
+                gen_key = generation_key(namespace)
+                keys[gen_key] = keys.get(gen_key, True) and stale
+        # the object is gone, so are its references
+        cache_delete_many(references)
+
+    # invalidate lists named by an alias of their object under their
+    # canonical namespace too
+    aliases = {}
+    for key in keys:
+        if key.startswith('generation:'):
+            parts = key[len('generation:'):].split('/', 2)
+            if len(parts) == 3 and parts[0] in _alias_nouns:
+                aliases[alias_key(parts[0], parts[1])] = (key, parts)
+    if aliases:
+        keys = dict(keys)
+        for akey, id in cache_get_many(aliases.keys()).iteritems():
+            key, (noun, alias, link) = aliases[akey]
+            gen_key = link_cache_key(noun, id, link)
+            keys[gen_key] = keys.get(gen_key, True) and keys[key]
+
+    deletes = []
+    for key, stale in keys.iteritems():
+        if key.startswith('generation:'):
+            log.debug("invalidating lists in namespace %s" % key[len('generation:'):])
+            bump_generation(key[len('generation:'):], stale and 1 or 2)
+        elif stale and _soft_timeout():
+            log.debug("marking key %s stale" % key)
+            deletes.append(fresh_key(key))
+        else:
+            log.debug("invalidating key %s" % key)
+            deletes.append(key)
+    if deletes:
+        cache_delete_many(deletes)
+    stats.incr('keys_invalidated', len(keys))
+
+
+def defer_invalidations(**kwargs):
+    _invalidations.pending = {}
+request_started.connect(defer_invalidations)
+
+
+def finish_invalidations(**kwargs):
+    flush_invalidations()
+    _invalidations.pending = None
+request_finished.connect(finish_invalidations)
+
+
+_refreshes = threading.local()
+
+
+def queue_refresh(reqinfo, callback):
+    """Queues the cacheable subrequest ``reqinfo`` to be made again after
+    the current response has been sent, to refresh a stale cached value
+    that was served in its place."""
+    pending = getattr(_refreshes, 'pending', None)
+    if pending is None:
+        pending = _refreshes.pending = {}
+    if reqinfo['uri'] not in pending:
+        log.debug("queueing refresh of %s" % reqinfo['uri'])
+        callback.refreshing = True
+        pending[reqinfo['uri']] = (reqinfo, callback)
+
+
+def refresh_stale(**kwargs):
+    """Makes the subrequests queued by `queue_refresh()`, refreshing the
+    stale values that were served from the cache.
+
+    This is called when a request is finished. If the
+    `CACHE_REFRESH_IN_THREAD` setting is on, the subrequests are made in
+    a new background thread instead.
+
+    """
+    pending = getattr(_refreshes, 'pending', None)
+    if not pending:
+        return
+    _refreshes.pending = None
+
+    if getattr(settings, 'CACHE_REFRESH_IN_THREAD', False):
+        thread = threading.Thread(target=_refresh_in_thread,
+            args=(pending.values(),))
+        thread.setDaemon(True)
+        thread.start()
+    else:
+        _refresh(pending.values())
+
+request_finished.connect(refresh_stale)
+
+
+def _refresh(jobs):
+    leases = []
+    if _leases_enabled():
+        # skip the refreshes another process is already making
+        refreshing = []
+        for reqinfo, callback in jobs:
+            key = callback.fill_key()
+            if acquire_lease(key):
+                leases.append(key)
+                refreshing.append((reqinfo, callback))
+            else:
+                stats.incr('refreshes_coalesced')
+        jobs = refreshing
+    if not jobs:
+        return
+
+    stats.incr('refreshes', len(jobs))
+    try:
+        typepad.client.batch_request()
+        for reqinfo, callback in jobs:
+            typepad.client.batch(reqinfo, callback)
+        typepad.client.complete_batch()
+    except Exception, exc:
+        log.error("Error refreshing stale cache entries: %s" % str(exc))
+        typepad.client.clear_batch()
+    release_leases(leases)
+
+
+def _refresh_in_thread(jobs):
+    # a new thread has a client of its own, so give it the
+    # application's own credentials
+    consumer = oauth.OAuthConsumer(settings.OAUTH_CONSUMER_KEY,
+        settings.OAUTH_CONSUMER_SECRET)
+    token = oauth.OAuthToken(settings.OAUTH_GENERAL_PURPOSE_KEY,
+        settings.OAUTH_GENERAL_PURPOSE_SECRET)
+    backend = urlparse(settings.BACKEND_URL)
+    typepad.client.clear_credentials()
+    typepad.client.add_credentials(consumer, token, domain=backend[1])
+    _refresh(jobs)
+
+
 class CachingCallback(object):
 
     """A callback class used for cacheable subrequests.
@@ -44,6 +866,7 @@ class CachingCallback(object):
 
     def __init__(self, promise):
         self.promise = promise
+        self.refreshing = False
 
     def __call__(self, *args, **kwargs):
         """When invoked as a callable, pass through control to
@@ -51,10 +874,137 @@ class CachingCallback(object):
 
         self.promise._cache_callback(*args, **kwargs)
 
-    def is_cached(self):
+    def cache_keys(self):
+        """Yields the cache keys that must be looked up before the
+        subrequest in context can be checked against the cache."""
+        return self.promise._cache_keys()
+
+    def item_cache_keys(self, found):
+        """Yields any further cache keys needed to satisfy the subrequest in
+        context, given the values already ``found`` in the cache."""
+        return self.promise._item_cache_keys(found)
+
+    def is_cached(self, found=None):
         """Yields a boolean result indicating if the subrequest in context can
-        be satisfied from the cache."""
-        return self.promise._deliver_from_cache()
+        be satisfied from the cache.
+
+        If provided, ``found`` is a dictionary of values already retrieved
+        from the cache for the keys yielded by `cache_keys()` and
+        `item_cache_keys()`; otherwise, the cache is consulted directly.
+
+        """
+        return self.promise._deliver_from_cache(found)
+
+    def fill_key(self):
+        """Yields the cache key the subrequest in context fills."""
+        return self.promise.cache_key
+
+    def is_stale(self):
+        """Yields a boolean result indicating if the cached value that
+        satisfied the subrequest in context was stale and should be
+        refreshed."""
+        return self.promise._stale
+
+    def not_found(self):
+        """Yields the `NotFound` exception to raise for the subrequest in
+        context when the cache recorded that its object doesn't exist, or
+        ``None``."""
+        return getattr(self.promise, '_not_found', None)
+
+    def missing_range(self):
+        """Yields the start index and count of the items to request from the
+        API when the subrequest in context could be only partially
+        satisfied from the cache, or ``None`` to make the subrequest
+        unchanged."""
+        return self.promise._missing_range()
+
+    def head_missed(self):
+        """Yields a boolean result indicating if the subrequest in context
+        was narrowed to the head of its list, but the response didn't
+        overlap the cached list, so it must be made again unchanged."""
+        return getattr(self.promise, '_head_missed', False)
+
+    def partial_missed(self):
+        """Yields a boolean result indicating if the subrequest in context
+        was narrowed to the part of its range missing from the cache, but
+        the list's length had changed since the rest was cached, so it
+        must be made again unchanged."""
+        return getattr(self.promise, '_partial_missed', False)
+
+
+def _find_cached(callbacks):
+    """Looks up all the cache keys needed by the `CachingCallback` instances
+    ``callbacks``, returning a dictionary of the values found.
+
+    The lookups are made in phases, one multiple-key get per phase: first
+    the objects requested and the generations of the lists requested,
+    then the lists themselves, then the items in those lists, then the
+    objects embedded in those items.
+
+    """
+    found = {}
+    seen = set()
+    keys = set()
+    for callback in callbacks:
+        keys.update(callback.cache_keys())
+    while keys:
+        seen.update(keys)
+        found.update(cache_get_many(list(keys)))
+        keys = set()
+        for callback in callbacks:
+            keys.update(callback.item_cache_keys(found))
+        keys.difference_update(seen)
+    return found
+
+
+def _embedded_object_key(item):
+    """Returns the cache key of the object embedded in ``item`` (such as the
+    asset of an `Event`), or ``None`` if it has none."""
+    if item is None or not hasattr(item, 'object'):
+        return None
+    obj = item.object
+    if not hasattr(obj, 'cache_key'):
+        return None
+    return obj.cache_key
+
+
+def _narrow_request(request, start, count):
+    """Rewrites the ranged subrequest ``request`` to request only ``count``
+    items beginning at index ``start``."""
+    uri, _, query = request.reqinfo['uri'].partition('?')
+    args = [(k, v) for k, v in cgi.parse_qsl(query)
+        if k not in ('start-index', 'max-results')]
+    args.extend((('start-index', start), ('max-results', count)))
+    request.reqinfo['uri'] = '%s?%s' % (uri, urlencode(args))
+
+
+def _in_batch(kwargs):
+    """Returns whether a subrequest made with the keyword arguments
+    ``kwargs`` will be part of a batch request that is open now."""
+    if not kwargs.get('batch', typepad.TypePadObject.batch_requests):
+        return False
+    return getattr(typepad.client, 'batchrequest', None) is not None
+
+
+class DeferredCallback(object):
+
+    """Stands in for the callback of a subrequest made in another thread,
+    keeping the responses it's given so they can be given to the real
+    callback in this thread with `replay()`."""
+
+    def __init__(self, callback):
+        self.orig_callback = callback
+        self.calls = []
+
+    def alive(self):
+        return self.orig_callback.alive()
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+
+    def replay(self):
+        for args, kwargs in self.calls:
+            self.orig_callback(*args, **kwargs)
 
 
 class CachingTypePadClient(typepad.TypePadClient):
@@ -62,13 +1012,73 @@ class CachingTypePadClient(typepad.TypePadClient):
     """A TypePadClient subclass that is aware of front-end caching.
 
     When ``complete_batch`` is executed, this client will weed out any
-    subrequests that can be provided from the cache. If any remain,
-    a normal batch request is issued.
+    subrequests that can be provided from the cache. The cache lookups
+    for all cacheable subrequests are made together, in a few
+    multiple-key gets (see `_find_cached()`). Ranged list subrequests
+    the cache can partly satisfy are narrowed to the range that is
+    missing. Stale cached values are served, and their subrequests are
+    queued to be made after the response is sent.
+
+    When the `CACHE_FILL_LEASE_TIMEOUT` setting is on, a subrequest that
+    misses the cache is only made if no other process is already filling
+    the same cache key; otherwise the client waits briefly for that
+    process to fill it.
+
+    If any subrequests remain, a normal batch request is issued, and the
+    cache writes made from its responses are buffered and flushed with
+    one multiple-key set per cache timeout. Subrequests narrowed to the
+    head of a list that turned out not to overlap the cached list, or to
+    the missing part of a list whose length has changed, are made again
+    for their whole range in a second batch request.
+
+    Batch requests are reentrant: ``batch_request()`` while a batch is
+    open joins that batch, instead of failing, so helpers that make
+    their own batch requests can be used while a view's batch is open.
+    Completing a joined batch makes the subrequests added to the batch
+    so far in one round trip, since the code that joined it needs its
+    data then, and leaves an empty batch open for the code that opened
+    it to carry on with. Subrequests the opener adds after that are
+    made in another round trip when it completes the batch.
+
+    Batches with more than `BATCH_SPLIT_SIZE` subrequests left to make
+    are split into sub-batches that are sent concurrently (see
+    `_send_batch()`).
 
     """
 
+    _batch_depth = 0
+
+    def batch_request(self):
+        if hasattr(self, 'batchrequest'):
+            # join the batch already open in this request
+            self._batch_depth += 1
+            stats.incr('batches_joined')
+            return self
+        return super(CachingTypePadClient, self).batch_request()
+
+    def clear_batch(self):
+        self._batch_depth = 0
+        super(CachingTypePadClient, self).clear_batch()
+
     def complete_batch(self):
-        # check to see if we can provide this from the cache
+        if self._batch_depth:
+            # the data is needed now, but the code that opened the batch
+            # still expects it to be open
+            depth = self._batch_depth - 1
+            self._batch_depth = 0
+            try:
+                self.complete_batch()
+            finally:
+                self.clear_batch()
+                self.batch_request()
+                self._batch_depth = depth
+            return
+
+        # so this batch doesn't read values invalidated earlier in the request
+        flush_invalidations()
+
+        cacheable = {}
+        refreshing = {}
         requests = []
         for request in self.batchrequest.requests:
             cb = request.callback
@@ -82,12 +1092,295 @@ class CachingTypePadClient(typepad.TypePadClient):
             if hasattr(cb, 'callback'):
                 callback = cb.callback()
                 if isinstance(callback, CachingCallback):
-                    if callback.is_cached():
-                        continue
+                    if callback.refreshing:
+                        refreshing[request] = callback
+                    else:
+                        cacheable[request] = callback
             requests.append(request)
 
+        leases = []
+        not_found = []
+        if cacheable:
+            # check to see if we can provide these from the cache
+            found = _find_cached(cacheable.values())
+            cached = set()
+            waiting = []
+            for request in requests:
+                callback = cacheable.get(request)
+                if callback is None:
+                    continue
+                if callback.is_cached(found):
+                    if callback.is_stale():
+                        queue_refresh(request.reqinfo, callback)
+                    cached.add(request)
+                elif _leases_enabled():
+                    # let only one process fill each cache key at a time
+                    key = callback.fill_key()
+                    if acquire_lease(key):
+                        stats.incr('fills')
+                        leases.append(key)
+                    else:
+                        waiting.append(request)
+
+            if waiting:
+                cached.update(self._wait_for_fills(waiting, cacheable))
+
+            for request in requests:
+                if request in cached and cacheable[request].not_found():
+                    not_found.append(cacheable[request].not_found())
+            requests = [request for request in requests if request not in cached]
+
+        narrowed = {}
+        for request in requests:
+            callback = cacheable.get(request) or refreshing.get(request)
+            if callback is None:
+                continue
+            missing = callback.missing_range()
+            if missing is not None:
+                narrowed[request] = (request.reqinfo['uri'], callback)
+                _narrow_request(request, *missing)
+
         self.batchrequest.requests = requests
-        super(CachingTypePadClient, self).complete_batch()
+
+        # the cache writes made by the response callbacks go out together
+        buffer_cache_writes()
+        try:
+            self._send_batch()
+
+            # head windows that didn't overlap the cached lists, and
+            # partial ranges of lists that changed length
+            retry = [(dict(request.reqinfo, uri=uri), callback)
+                for request, (uri, callback) in narrowed.iteritems()
+                if callback.head_missed() or callback.partial_missed()]
+            if retry:
+                head_misses = len([callback for reqinfo, callback in retry
+                    if callback.head_missed()])
+                if head_misses:
+                    stats.incr('head_refresh_misses', head_misses)
+                if len(retry) > head_misses:
+                    stats.incr('partial_fill_misses', len(retry) - head_misses)
+                self.batch_request()
+                for reqinfo, callback in retry:
+                    self.batch(reqinfo, callback)
+                super(CachingTypePadClient, self).complete_batch()
+        finally:
+            flush_cache_writes()
+            release_leases(leases)
+
+        if not_found:
+            # as the subrequest would have, had it been made
+            raise not_found[0]
+
+    def _send_batch(self):
+        """Makes the open batch request.
+
+        If it has more than `BATCH_SPLIT_SIZE` subrequests, it's split
+        into sub-batches of that size, which are sent from up to
+        `BATCH_SPLIT_THREADS` threads at once. Each thread uses a copy of
+        this client, and only keeps the responses; they're given to the
+        subrequests' callbacks here afterward, in the order the
+        subrequests were made. How long each sub-batch took is kept in
+        the batch request's ``sub_batch_times``, as pairs of the number
+        of subrequests and the seconds taken.
+
+        """
+        size = getattr(settings, 'BATCH_SPLIT_SIZE', 0)
+        batchrequest = self.batchrequest
+        requests = batchrequest.requests
+        if not size or len(requests) <= size:
+            return super(CachingTypePadClient, self).complete_batch()
+
+        for request in requests:
+            request.callback = DeferredCallback(request.callback)
+
+        batchrequest.sub_batches = []
+        sub_batches = Queue.Queue()
+        for i, start in enumerate(range(0, len(requests), size)):
+            sub_batch = type(batchrequest)()
+            sub_batch.requests = requests[start:start + size]
+            batchrequest.sub_batches.append(sub_batch)
+            sub_batches.put((i, sub_batch))
+        count = len(batchrequest.sub_batches)
+        stats.incr('sub_batches', count)
+
+        errors = []
+        times = [None] * count
+        def send():
+            client = copy.copy(self)
+            # don't share HTTP connections between threads
+            client.connections = {}
+            while True:
+                try:
+                    i, sub_batch = sub_batches.get_nowait()
+                except Queue.Empty:
+                    return
+                start = time.time()
+                client.batchrequest = sub_batch
+                try:
+                    super(CachingTypePadClient, client).complete_batch()
+                except Exception, exc:
+                    errors.append(exc)
+                times[i] = (len(sub_batch.requests), time.time() - start)
+                log.debug("Sub-batch %d of %d: %d subrequests in %.3fs",
+                    i + 1, count, times[i][0], times[i][1])
+
+        threads = [threading.Thread(target=send) for i in
+            range(min(count, getattr(settings, 'BATCH_SPLIT_THREADS', 4)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # closed, as the base complete_batch() does
+        del self.batchrequest
+        batchrequest.sub_batch_times = times
+
+        deferred = []
+        for request in requests:
+            deferred.append(request.callback)
+            request.callback = request.callback.orig_callback
+        for callback in deferred:
+            callback.replay()
+        if errors:
+            raise errors[0]
+
+    def _wait_for_fills(self, waiting, cacheable):
+        """Waits up to `CACHE_FILL_WAIT` seconds for other processes to fill
+        the cache for the ``waiting`` requests, returning the requests
+        that could then be satisfied from the cache."""
+        cached = []
+        deadline = time.time() + getattr(settings, 'CACHE_FILL_WAIT', 0.5)
+        while waiting and time.time() < deadline:
+            time.sleep(0.05)
+            found = _find_cached([cacheable[request] for request in waiting])
+            still_waiting = []
+            for request in waiting:
+                if cacheable[request].is_cached(found):
+                    stats.incr('fills_coalesced')
+                    cached.append(request)
+                else:
+                    still_waiting.append(request)
+            waiting = still_waiting
+
+        if waiting:
+            log.debug("gave up waiting for %d cache fills" % len(waiting))
+            stats.incr('fill_waits_expired', len(waiting))
+        return cached
+
+
+class IdList(object):
+
+    """The identifiers of the items of a cached list, by index.
+
+    Only the ranges of the list that have been requested are kept. Each
+    range is stored as one string of fixed-width identifiers, so the
+    whole list is cached as a small tuple of strings that is cheap to
+    unpickle, and looking up an index only slices the string holding it.
+
+    """
+
+    def __init__(self, total, width=0, runs=()):
+        self.total = total
+        self.width = width
+        # pairs of (start index, packed identifiers), in order and
+        # neither overlapping nor adjacent
+        self.runs = list(runs)
+
+    @classmethod
+    def from_cache(cls, value):
+        """Returns the `IdList` cached as ``value`` with `to_cache()`, or
+        ``None`` if ``value`` is not one."""
+        if not isinstance(value, tuple) or len(value) != 3:
+            return None
+        return cls(*value)
+
+    def to_cache(self):
+        return (self.total, self.width, tuple(self.runs))
+
+    def extend(self, other):
+        """Adds the identifiers of the `IdList` ``other``, which must not
+        overlap with ours, such as another segment of the same list."""
+        width = max(self.width, other.width)
+        if width != self.width:
+            self._repack(width)
+        if width != other.width:
+            other._repack(width)
+        self.runs.extend(other.runs)
+        self.runs.sort()
+
+    def segment(self, start, end):
+        """Returns a new `IdList` holding only the identifiers from index
+        ``start`` up to (but not including) index ``end``."""
+        runs = []
+        for run_start, packed in self.runs:
+            run_end = run_start + len(packed) / self.width
+            lo, hi = max(run_start, start), min(run_end, end)
+            if lo < hi:
+                runs.append((lo, packed[(lo - run_start) * self.width:(hi - run_start) * self.width]))
+        return IdList(self.total, self.width, runs)
+
+    def get(self, idx):
+        """Returns the identifier at index ``idx``, or ``None`` if it is not
+        known."""
+        i = bisect_right([start for start, packed in self.runs], idx) - 1
+        if i < 0:
+            return None
+        start, packed = self.runs[i]
+        offset = (idx - start) * self.width
+        if offset >= len(packed):
+            return None
+        return packed[offset:offset + self.width].rstrip()
+
+    def update(self, start, ids):
+        """Sets the identifiers from index ``start`` on to the identifiers
+        ``ids``."""
+        ids = [str(id) for id in ids]
+        if not ids:
+            return
+        width = max([self.width] + [len(id) for id in ids])
+        if width != self.width:
+            self._repack(width)
+        end = start + len(ids)
+
+        runs = []
+        merged = {}
+        for run in self.runs:
+            run_start, packed = run
+            run_end = run_start + len(packed) / width
+            if run_end < start or run_start > end:
+                runs.append(run)
+                continue
+            # this run touches the new one, so fold it in
+            for offset in range(0, len(packed), width):
+                merged[run_start + offset / width] = packed[offset:offset + width]
+        for offset, id in enumerate(ids):
+            merged[start + offset] = id.ljust(width)
+
+        indices = sorted(merged)
+        runs.append((indices[0], ''.join([merged[idx] for idx in indices])))
+        runs.sort()
+        self.runs = runs
+
+    def insert(self, idx, id):
+        """Inserts the identifier ``id`` at index ``idx``, moving the
+        identifiers from there on along by one."""
+        runs = []
+        for run_start, packed in self.runs:
+            if run_start >= idx:
+                runs.append((run_start + 1, packed))
+                continue
+            split = (idx - run_start) * self.width
+            runs.append((run_start, packed[:split]))
+            if packed[split:]:
+                runs.append((idx + 1, packed[split:]))
+        self.runs = runs
+        self.total += 1
+        self.update(idx, [id])
+
+    def _repack(self, width):
+        self.runs = [(start, ''.join([packed[offset:offset + self.width].rstrip().ljust(width)
+            for offset in range(0, len(packed), self.width)]))
+            for start, packed in self.runs]
+        self.width = width
 
 
 class CachedTypePadLinkPromise(object):
@@ -103,117 +1396,332 @@ class CachedTypePadLinkPromise(object):
 
     """
 
-    def __init__(self, link, obj, type=None, **kwargs):
+    def __init__(self, link, obj, type=None, head_refresh=False, **kwargs):
         self._inst = None
         self._link = link
+        self._head_refresh = head_refresh
+        self._head_base = None
+        self._head_missed = False
+        self._partial_missed = False
+        self._alias_id = None
+        self._alias_resolved = False
         self._start = 1
         self._end = 51
         self._id_cache = None
+        self._partial = None
+        self._stale = False
+        self._stale_inst = None
+        self._generation = None
         self._item_cache_key_pattern = None
 
-        # ie: objectcache:Event:xid
-        self._item_cache_key_pattern = ":".join(
-            ["objectcache", self._link.cls.entries.fld.cls.__name__, "%s"])
+        # ie: objectcache:1:Event:xid
+        self._item_cache_key_pattern = object_cache_key(
+            class_cache_namespace(self._link.cls.entries.fld.cls), "%s")
 
         kwargs['callback'] = CachingCallback(self)
         self._inst = self._link.__get__(obj, type, **kwargs)
         self._inst._cache_callback = kwargs['callback']
 
-    def _deliver_from_cache(self):
+    def _cache_keys(self):
+        if self._generation is None:
+            # we can't tell the list's key until we know its generation,
+            # nor the generation until we know the canonical identifier
+            # of the list's object
+            keys = [self.generation_key]
+            alias = _url_alias(self._inst._location)
+            if alias is not None and not self._alias_resolved:
+                keys.append(alias_key(*alias))
+            return keys
+        keys = self._segment_keys(self.cache_key, self._start, self._end)
+        if _soft_timeout():
+            # each segment is marked fresh when it's written
+            keys.extend([fresh_key(key) for key in keys])
+        if _soft_timeout() or self._head_refreshable():
+            keys.extend(self._segment_keys(
+                self._list_key(self._location, self._generation - 1),
+                self._start, self._end))
+        return keys
+
+    def _head_refreshable(self):
+        """Returns whether the list is refreshed by requesting only a window
+        of new items at its head (see `_splice_head()`)."""
+        window = getattr(settings, 'LIST_CACHE_HEAD_WINDOW', 10)
+        return self._head_refresh and self._start == 1 and window < self._end - 1
+
+    @staticmethod
+    def _segments(start, end):
+        """Returns the start and (exclusive) end indices of the segments of
+        a cached list that hold the identifiers from index ``start`` up to
+        (but not including) index ``end``.
+
+        Each segment holds `LIST_CACHE_SEGMENT_SIZE` identifiers, so a
+        list of any length can be cached, and reading a page loads only
+        the segments the page falls in.
+
+        """
+        size = getattr(settings, 'LIST_CACHE_SEGMENT_SIZE', 500)
+        first = (start - 1) / size
+        last = max(first, (end - 2) / size)
+        return [(n * size + 1, (n + 1) * size + 1) for n in range(first, last + 1)]
+
+    def _segment_keys(self, list_key, start, end):
+        return ['%s:%d' % (list_key, seg_start) for seg_start, seg_end
+            in self._segments(start, end)]
+
+    def _load_ids(self, found, list_key):
+        ids = None
+        for key in self._segment_keys(list_key, self._start, self._end):
+            segment = IdList.from_cache(found.get(key))
+            if ids is None:
+                # the segment holding the start of the range tells the
+                # length of the list; without it, it's a miss
+                if segment is None:
+                    return None
+                ids = segment
+            elif segment is not None and segment.total == ids.total:
+                # segments cached when the list had a different length
+                # are out of date, so leave those indices to be refilled
+                ids.extend(segment)
+        return ids
+
+    def _cached_ids(self, found):
+        """Returns the cached identifier list for the requested list from
+        the cache values ``found``, and whether it is a stale list from
+        the namespace's previous generation."""
+        ids = self._load_ids(found, self.cache_key)
+        if ids is None and _soft_timeout():
+            ids = self._previous_ids(found)
+            if ids is not None:
+                return ids, True
+        return ids, False
+
+    def _previous_ids(self, found):
+        """Returns the identifier list cached for the requested list in the
+        namespace's previous generation from the cache values ``found``."""
+        return self._load_ids(found,
+            self._list_key(self._location, self._generation - 1))
+
+    def _requested_range(self, ids):
+        """Returns the start and (exclusive) end indices of the requested
+        range, limited to the length of the list as given by the cached
+        identifier list ``ids``."""
+        end = self._end
+        if end > ids.total + 1:
+            end = ids.total + 1
+        return self._start, end
+
+    def _item_cache_keys(self, found):
+        if self._generation is None:
+            if self._resolve_alias(found) and self.generation_key not in found:
+                return [self.generation_key]
+            self._generation = get_generation(self.namespace, found)
+            return self._cache_keys()
+        ids, stale = self._cached_ids(found)
+        if ids is None and self._head_refreshable():
+            # the items of the previous generation to splice new ones onto
+            ids = self._previous_ids(found)
+        if ids is None:
+            return []
+        start, end = self._requested_range(ids)
+        keys = []
+        for idx in range(start, end):
+            id = ids.get(idx)
+            if id is None:
+                continue
+            item_key = self._item_cache_key_pattern % id
+            keys.append(item_key)
+            item = found.get(item_key)
+            if _is_not_found(item):
+                continue
+            # for things like Event objects that have an embedded object
+            # that has a cache_key, check that also
+            object_key = _embedded_object_key(item)
+            if object_key is not None:
+                keys.append(object_key)
+        return keys
+
+    def _deliver_from_cache(self, found=None):
         """Attempts to provide the `ListObject` data from the cache.
 
         When a cached value is unavailable, returns ``False``; otherwise,
         populates the instance and returns ``True``.
 
+        If only part of the requested range is unavailable, the cached
+        items are kept so the subrequest can be narrowed to the missing
+        range (see `_missing_range()`) and merged with them when the
+        response arrives.
+
+        For lists cached with ``head_refresh``, the first page of a list
+        whose cached items are out of date but complete is requested only
+        for its newest items, which are spliced onto the cached ones (see
+        `_splice_head()`).
+
         """
 
+        self._partial = None
+        self._head_base = None
+        self._id_cache = None
+        if found is None:
+            found = _find_cached([CachingCallback(self)])
         cache_key = self.cache_key
-        ids = cache.get(cache_key)
 
-        start = self._start
-        end = self._end
-        items = None
-
-        if ids is not None:
-            items = []
-
-            if ids[0] > 0:
-                if end > ids[0] + 1:
-                    end = ids[0] + 1
-
-                subset = ids[start:end]
-                itemkeys = []
-
-                # if one of our elements is empty, don't bother building
-                # list of ids; this cache is invalid
-                if None not in subset:
-                    for id in subset:
-                        itemkeys.append(self._item_cache_key_pattern % id)
-
-                if len(itemkeys) > 0:
-                    itemdict = cache.get_many(itemkeys)
-                    for key in itemkeys:
-                        if itemdict.get(key) is None:
-                            items = None
-                            log.debug("cache partial miss for key %s" % cache_key)
-                            break
-                        item = itemdict[key]
-                        if hasattr(item, 'object'):
-                            # for things like Event objects that have an embedded object
-                            # that has a cache_key, cache that also
-                            obj = item.object
-                            if hasattr(obj, 'cache_key'):
-                                object_key = obj.cache_key
-                                if cache.add(object_key, None, 1) > 0:
-                                    log.debug("cache partial miss due to missing object reference %s for key %s" % (object_key, cache_key))
-                                    cache.delete(object_key)
-                                    items = None
-                                    break
-                        items.append(itemdict[key])
-                else:
-                    log.debug("cache subset miss for key %s; ids[0] %d, start %d, end %d" % (cache_key, ids[0], start, end))
-
-            if (items is not None) and ((len(items) > 0) or (ids[0] == 0)):
-                log.debug("cache hit for key %s" % cache_key)
-                l = typepad.ListObject()
-                l._delivered = True
-                l.entries = items
-                l.start_index = start
-                l.total_results = ids[0]
-                self._inst = l
-                return True
-        else:
+        ids, stale = self._cached_ids(found)
+        if ids is None:
             log.debug("cache key miss for key %s" % cache_key)
-
-        return False
+            if self._head_refreshable():
+                base = self._previous_ids(found)
+                if base is not None and base.total > 0:
+                    items, missing = self._cached_items(base, found)
+                    if not missing:
+                        self._head_base = (base, items)
+            return False
+        if not stale:
+            # identifiers from the previous generation mustn't be written
+            # back into the current one when the list is refreshed
+            self._id_cache = ids
+
+        start, end = self._requested_range(ids)
+        if ids.total > 0 and start >= end:
+            log.debug("cache subset miss for key %s; total %d, start %d, end %d" % (cache_key, ids.total, start, end))
+            return False
+
+        items, missing = self._cached_items(ids, found)
+        if missing:
+            if items and not stale:
+                log.debug("cache partial miss for key %s; fetching %d to %d" % (cache_key, missing[0], missing[-1]))
+                self._partial = (missing[0], missing[-1] + 1, items)
+            else:
+                log.debug("cache subset miss for key %s; total %d, start %d, end %d" % (cache_key, ids.total, start, end))
+            return False
+
+        log.debug("cache hit for key %s" % cache_key)
+        if _soft_timeout() and (stale or [key for key
+                in self._segment_keys(cache_key, self._start, self._end)
+                if fresh_key(key) not in found]):
+            # serve it anyway, but keep the list we'd have requested
+            # so it can be refreshed
+            log.debug("cache key %s is stale" % cache_key)
+            self._stale = True
+            self._stale_inst = self._inst
+            if self._head_refreshable() and ids.total > 0:
+                self._head_base = (ids, items)
+
+        l = typepad.ListObject()
+        l._delivered = True
+        l.entries = [items[idx] for idx in range(start, end)]
+        l.start_index = start
+        l.total_results = ids.total
+        self._inst = l
+        return True
+
+    def _cached_items(self, ids, found):
+        """Returns the items of the requested range of the identifier list
+        ``ids`` found in the cache values ``found``, by index, and the
+        indices of those that weren't."""
+        start, end = self._requested_range(ids)
+        items = {}
+        missing = []
+        for idx in range(start, end):
+            item = None
+            id = ids.get(idx)
+            if id is not None:
+                item = found.get(self._item_cache_key_pattern % id)
+            if _is_not_found(item):
+                # an object found missing by another request isn't an item
+                item = None
+            # an embedded object that has been invalidated means this
+            # item is stale
+            object_key = _embedded_object_key(item)
+            if object_key is not None and (object_key not in found
+                    or _is_not_found(found[object_key])):
+                log.debug("cache partial miss due to missing object reference %s for key %s" % (object_key, self.cache_key))
+                item = None
+            if item is None:
+                missing.append(idx)
+            else:
+                items[idx] = item
+        return items, missing
+
+    def _missing_range(self):
+        """Returns the start index and count of the items to request when
+        the cache could provide only part of the requested range, or
+        ``None`` if the whole range should be requested."""
+        if self._head_base is not None:
+            return 1, getattr(settings, 'LIST_CACHE_HEAD_WINDOW', 10)
+        if self._partial is None:
+            return None
+        start, end, items = self._partial
+        return start, end - start
 
     def _cache_callback(self, *args, **kwargs):
         """Callback used to populate the cache from an API response.
 
-        It will create 1 key (with a name of ``listcache:URL``, where
-        ``URL`` is the endpoint that was retrieved) assigned with an array
-        of TypePad identifiers that comprise the list. It also populates
-        the cache with each individual object (using a key of
-        ``objectcache:OBJECT_TYPE:OBJECT_ID``).
+        It will create keys (with names of
+        ``listcache:GENERATION:URL:INDEX``, where ``URL`` is the endpoint
+        that was retrieved and ``INDEX`` the first index of the segment)
+        assigned with the segments of the `IdList` of TypePad identifiers
+        that comprise the list, one for each segment the response covers,
+        and marks each of them fresh. It also populates the cache with
+        each individual object (using a key of
+        ``objectcache:VERSION:OBJECT_TYPE:OBJECT_ID``).
+
+        The list's namespace is also recorded as referencing each item and
+        embedded object (see `record_list_references()`).
+
+        When the subrequest was narrowed to a partial range, the response
+        is merged with the items that were already cached, unless the
+        list's length has changed since. When that happens, or when it
+        was narrowed to a head window that doesn't overlap the cached
+        items, nothing is cached, and the subrequest must be made again
+        for the whole range.
 
         """
 
+        if self._stale_inst is not None:
+            # refreshing a stale list we served from the cache
+            self._inst, self._stale_inst = self._stale_inst, None
+            self._stale = False
+        callback = self._inst._cache_callback
         del self._inst._cache_callback
 
         self._inst.update_from_response(*args, **kwargs)
-        ids = self._id_cache or []
 
         # _start is None or 0, we don't care; start-index can't be less than 1
         start = self._start
-        end = self._end
-        while len(ids) <= end:
-            ids.append(None)
+        partial, self._partial = self._partial, None
+        if partial is not None:
+            start = partial[0]
+        head, self._head_base = self._head_base, None
+        self._head_missed = False
+        self._partial_missed = False
+
+        # keep identifiers cached for other ranges, unless the list
+        # has changed since they were cached
+        total = self._inst.total_results
+        if head is not None:
+            ids = self._splice_head(head[0], total)
+            if ids is None:
+                log.debug("head of %s doesn't overlap the cached list" % args[0])
+                self._head_missed = True
+                self._inst._cache_callback = callback
+                return
+        elif self._id_cache is not None and self._id_cache.total == total:
+            ids = self._id_cache
+        elif partial is not None:
+            # the cached items no longer line up with the response
+            log.debug("list length changed from %d to %d during partial fill" % (self._id_cache.total, total))
+            self._id_cache = None
+            self._partial_missed = True
+            self._inst._cache_callback = callback
+            return
+        else:
+            ids = IdList(total)
 
-        ids[0] = self._inst.total_results
-        idx = start
+        referenced = []
         for item in self._inst.entries:
             item_key = item.cache_key
             log.debug("setting key %s" % item_key)
+            referenced.append(item.xid)
             if hasattr(item, 'object'):
                 # for things like Event objects that have an embedded object
                 # that has a cache_key, cache that also
@@ -221,36 +1729,135 @@ class CachedTypePadLinkPromise(object):
                 if hasattr(obj, 'cache_key'):
                     object_key = obj.cache_key
                     log.debug("setting key %s" % object_key)
-                    cache.set(object_key, obj)
-            cache.set(item_key, item)
-            ids[idx] = item.xid
-            idx += 1
+                    cache_set(object_key, obj)
+                    referenced.append(obj.xid)
+            cache_set(item_key, item)
+        ids.update(start, [item.xid for item in self._inst.entries])
         self._id_cache = ids
+        end = start + len(self._inst.entries)
+        if head is not None:
+            # write out the whole spliced list
+            end = max([run_start + len(packed) / ids.width
+                for run_start, packed in ids.runs])
 
         # hmm. we need to rebuild the list cache key based on the
         # originating url; httpobject changes the _location element
         # on us, like for member urls with a preferred username
         # (the username-based urls change to xid urls)
         # list_key = self.cache_key
-        list_key = 'listcache:' + args[0].split('?')[0]
-        log.debug("setting key %s" % list_key)
+        url = self._canonical(args[0])
+        namespace = list_namespace(url)
+        if namespace == self.namespace and self._generation is not None:
+            generation = self._generation
+        else:
+            generation = get_generation(namespace)
+        list_key = self._list_key(url, generation)
+
+        for seg_start, seg_end in self._segments(start, end):
+            segment_key = '%s:%d' % (list_key, seg_start)
+            log.debug("setting key %s" % segment_key)
+            cache_set(segment_key, ids.segment(seg_start, seg_end).to_cache())
+            mark_fresh(segment_key)
+        record_list_references(namespace, referenced)
+
+        if partial is not None:
+            items = partial[2]
+            for offset, item in enumerate(self._inst.entries):
+                items[partial[0] + offset] = item
+            self._inst.entries = [items[idx] for idx in sorted(items)]
+            self._inst.start_index = self._start
+        elif head is not None:
+            base, items = head
+            shift = total - base.total
+            log.debug("spliced %d new items onto %s" % (shift, list_key))
+            stats.incr('head_refreshes')
+            window = self._inst.entries
+            last = min(self._end, total + 1)
+            self._inst.entries = window[:last - 1] + [items[idx - shift]
+                for idx in range(len(window) + 1, last)]
+            self._inst.start_index = 1
+
+    def _splice_head(self, base, total):
+        """Returns the `IdList` of the list made by adding the new items
+        of the head window just received in front of the cached
+        identifier list ``base``.
+
+        Returns ``None`` if the window doesn't overlap ``base``, as when
+        more items were added than the window holds, or if the list
+        changed other than at its head.
 
-        cache.set(list_key, ids)
+        """
+        window = [str(item.xid) for item in self._inst.entries]
+        shift = total - base.total
+        if not 0 <= shift < len(window):
+            return None
+        for offset in range(shift, len(window)):
+            if base.get(offset - shift + 1) != window[offset]:
+                return None
+        ids = IdList(total, base.width,
+            [(run_start + shift, packed) for run_start, packed in base.runs])
+        ids.update(1, window[:shift])
+        return ids
+
+    def _resolve_alias(self, found=None):
+        """Looks up the canonical identifier of the list's object in the
+        cache values ``found`` (or the cache), if its endpoint refers to
+        the object by an alias, returning whether the list's location
+        changed."""
+        if self._alias_resolved:
+            return False
+        self._alias_resolved = True
+        alias = _url_alias(self._inst._location)
+        if alias is None:
+            return False
+        if found is None:
+            self._alias_id = cache_get(alias_key(*alias))
+        else:
+            self._alias_id = found.get(alias_key(*alias))
+        return self._alias_id is not None
+
+    def _canonical(self, url):
+        if self._alias_id is None or _url_alias(url) is None:
+            return url
+        return _canonical_url(url, self._alias_id)
+
+    @property
+    def _location(self):
+        """The location of the list, with its object referred to by its
+        canonical identifier."""
+        return self._canonical(self._inst._location)
+
+    @property
+    def namespace(self):
+        """The namespace of the list, as returned by `list_namespace()`."""
+        return list_namespace(self._location)
+
+    @property
+    def generation_key(self):
+        """The key of the generation counter of the list's namespace, which
+        is incremented to invalidate the list."""
+        return generation_key(self.namespace)
+
+    @staticmethod
+    def _list_key(url, generation):
+        # ie: listcache:<generation>:https://api.typepad.com/noun/<id>/noun.json
+        return ":".join(["listcache", str(generation), url.split("?")[0]])
 
     @property
     def cache_key(self):
         """Builds a key identifier for caching the list itself.
 
-        This is "listcache:URL", where URL is the location of the
-        endpoint requested (minus any query arguments, which are
-        only used for scoping record set).
+        This is "listcache:GENERATION:URL", where GENERATION is the
+        current generation of the list's namespace and URL is the
+        location of the endpoint requested (minus any query arguments,
+        which are only used for scoping record set).
 
         """
 
-        # ie: listcache:https://api.typepad.com/noun/<id>/noun.json
-        key = ":".join(
-            ["listcache", self._inst._location.split("?")[0]])
-        return key
+        if self._generation is None:
+            self._resolve_alias()
+            self._generation = get_generation(self.namespace)
+        return self._list_key(self._location, self._generation)
 
     def __getattr__(self, name):
         return getattr(self._inst, name)
@@ -306,24 +1913,154 @@ class CachedTypePadLinkPromise(object):
         return self
 
 
+NOT_FOUND = 'notfound'
+"""The value cached for objects the API reported were not found."""
+
+
+def _is_not_found(value):
+    return isinstance(value, basestring) and value == NOT_FOUND
+
+
+class CachedTypePadObjectPromise(object):
+
+    """Tracks a cacheable subrequest for a single `TypePadObject`, so it can
+    be satisfied from the cache when its batch request is completed."""
+
+    def __init__(self, key, alias=None):
+        self.key = key
+        self.obj = None
+        self._stale = False
+        self._not_found = None
+        # (noun, requested identifier, key pattern) of objects that are
+        # also known by aliases
+        self._alias = alias
+        self._alias_resolved = alias is None
+
+    @property
+    def cache_key(self):
+        return self.key
+
+    def _cache_keys(self):
+        keys = [self.key]
+        if _soft_timeout():
+            keys.append(fresh_key(self.key))
+        if not self._alias_resolved:
+            noun, id, pattern = self._alias
+            keys.append(alias_key(noun, id))
+        return keys
+
+    def _item_cache_keys(self, found):
+        if self._alias_resolved:
+            return []
+        self._alias_resolved = True
+        noun, id, pattern = self._alias
+        canonical = found.get(alias_key(noun, id))
+        if canonical is None:
+            return []
+        # the object was requested by an alias, so look it up by its
+        # canonical identifier
+        self.key = pattern % canonical
+        _remember(self.key, self.obj)
+        return self._cache_keys()
+
+    def _missing_range(self):
+        return None
+
+    def _deliver_from_cache(self, found=None):
+        if found is None:
+            cached = cache_get(self.key)
+        else:
+            cached = found.get(self.key)
+        if cached is None:
+            log.debug("cache key miss for key %s" % self.key)
+            return False
+
+        stale = _soft_timeout() and found is not None and fresh_key(self.key) not in found
+        if _is_not_found(cached):
+            if stale:
+                # check again whether it exists
+                log.debug("cache key %s is a stale negative entry" % self.key)
+                return False
+            log.debug("cache negative hit for key %s" % self.key)
+            stats.incr('negative_hits')
+            _forget(self.key)
+            del self.obj._cache_callback
+            self._not_found = self.obj.NotFound('%s was not found' % self.obj._location)
+            return True
+
+        log.debug("cache hit for key %s" % self.key)
+        if stale:
+            log.debug("cache key %s is stale" % self.key)
+            self._stale = True
+        else:
+            del self.obj._cache_callback
+        self.obj.__dict__.update(cached.__dict__)
+        return True
+
+    def _cache_callback(self, *args, **kwargs):
+        obj = self.obj
+        del obj._cache_callback
+        self._stale = False
+        try:
+            obj.update_from_response(*args, **kwargs)
+        except typepad.TypePadObject.NotFound:
+            # so asking for it again raises NotFound again
+            _forget(self.key)
+            timeout = getattr(settings, 'CACHE_NOT_FOUND_TIMEOUT', None)
+            if timeout:
+                log.debug("setting negative key %s" % self.key)
+                cache_set(self.key, NOT_FOUND, timeout)
+                mark_fresh(self.key)
+            raise
+        if self._alias is not None:
+            # cache the object under its canonical identifier only
+            noun, id, pattern = self._alias
+            record_alias(noun, id, obj.url_id)
+            self.key = pattern % obj.url_id
+            _remember(self.key, obj)
+        log.debug("setting key %s" % self.key)
+        cache_set(self.key, obj)
+        mark_fresh(self.key)
+
+
 class CachedTypePadObject(object):
 
     """A caching class for wrapping a method that returns a single
     `TypePadObject`.
 
     When invoked, the original bound method is called, along with a
-    callback argument that causes our cache to populate. If the object
-    is already in the cache, it is simply returned instead of causing
-    a subrequest.
+    callback argument that causes our cache to populate. Inside a batch
+    request, the cache is checked along with all the other cacheable
+    subrequests when the batch is completed. Otherwise, if the object is
+    already in the cache, it is simply returned instead of causing a
+    subrequest.
+
+    When the subrequest for an object ends in `NotFound`, a negative entry
+    is cached for `CACHE_NOT_FOUND_TIMEOUT` seconds, and batches asking for
+    the object raise `NotFound` without making the subrequest again. The
+    negative entry is invalidated along with the object.
+
+    While a request is being handled, requesting an object that was already
+    requested (under the same or, once it's known, its canonical
+    identifier) returns the same object, without another subrequest or
+    cache lookup. The duplicates collapsed are counted in `stats`.
+
+    If ``alias`` is given, the objects can also be requested by an alias,
+    such as a user's username. Objects are then cached only under their
+    canonical URL identifier, and the URL identifier of each alias is
+    recorded in the cache for the noun ``alias`` (see `record_alias()`),
+    so cached values and invalidations of lists with URLs using either
+    identifier are shared.
 
     """
 
-    cache_key = "objectcache:%s:%%s"
-
-    def __init__(self, func):
+    def __init__(self, func, alias=None):
         self.func = func
         self.cls = func.im_self
-        self.cache_key = self.cache_key % func.im_self.__name__
+        self.cache_key = object_cache_key(class_cache_namespace(func.im_self), "%s")
+        self.alias = alias
+        if alias is not None:
+            _alias_nouns.add(alias)
 
     def __call__(self, *args, **kwargs):
         if not kwargs.get('cache', True):
@@ -331,21 +2068,39 @@ class CachedTypePadObject(object):
             return self.func(*args, **kwargs)
 
         key = self.cache_key % args[0]
-        obj = cache.get(key)
+        obj = _identity(key)
         if obj is not None:
+            # already requested while handling this request
+            stats.incr('duplicates_collapsed')
             return obj
 
-        # okay, do the work
-        def cache_callback(*args, **kwargs):
-            del obj._cache_callback
-            obj.update_from_response(*args, **kwargs)
-            log.debug("setting key %s" % key)
-            cache.set(key, obj)
+        alias = None
+        if self.alias is not None:
+            alias = (self.alias, args[0], self.cache_key)
+        if not _in_batch(kwargs):
+            requested_key = key
+            if alias is not None:
+                canonical = cache_get(alias_key(self.alias, args[0]))
+                if canonical is not None:
+                    key = self.cache_key % canonical
+                    obj = _identity(key)
+            if obj is not None:
+                stats.incr('duplicates_collapsed')
+            else:
+                obj = cache_get(key)
+            if obj is not None and not _is_not_found(obj):
+                _remember(requested_key, obj)
+                _remember(key, obj)
+                return obj
 
-        kwargs['callback'] = cache_callback
+        # okay, do the work
+        promise = CachedTypePadObjectPromise(key, alias)
+        kwargs['callback'] = CachingCallback(promise)
         obj = self.func(*args, **kwargs)
+        promise.obj = obj
         # this is so our callback reference doesn't disappear
-        obj._cache_callback = cache_callback
+        obj._cache_callback = kwargs['callback']
+        _remember(key, obj)
         return obj
 
 cache_object = CachedTypePadObject
@@ -356,7 +2111,7 @@ def make_tpobject_cache_key(self):
 
     """
 
-    return "objectcache:%s:%s" % (self.cache_namespace, self.xid)
+    return object_cache_key(self.cache_namespace, self.xid)
 
 typepad.TypePadObject.cache_key = property(make_tpobject_cache_key)
 
@@ -371,31 +2126,83 @@ typepad.TypePadObject.cache_namespace = property(make_tpobject_cache_namespace)
 
 class CachedTypePadLink(object):
 
-    def __init__(self, link):
+    """Caches the lists of the TypePad `Link` field ``link``.
+
+    With ``head_refresh``, lists that mostly change at their head, such as
+    event streams, are refreshed by requesting only their
+    `LIST_CACHE_HEAD_WINDOW` newest items and splicing them onto the items
+    already cached.
+
+    """
+
+    def __init__(self, link, head_refresh=False):
         self.link = link
+        self.head_refresh = head_refresh
 
     def __get__(self, obj, type=None, **kwargs):
         if obj is None:
             return self
-        return CachedTypePadLinkPromise(self.link, obj, type, **kwargs)
+        return CachedTypePadLinkPromise(self.link, obj, type,
+            head_refresh=self.head_refresh, **kwargs)
 
 cache_link = CachedTypePadLink
 
 
+def cache_list_insert(url, obj, index=None):
+    """Writes the newly created API object ``obj`` through to the cached
+    list of the endpoint ``url``, at index ``index`` (or at the end of the
+    list), and caches ``obj`` itself.
+
+    Only the list at ``url`` is updated, so this is for namespaces that
+    have no other filtered views. Returns whether the cached list is up to
+    date; if it isn't, the caller should invalidate the list instead.
+
+    """
+    namespace = list_namespace(url)
+    generation = cache_get(generation_key(namespace))
+    if generation is None:
+        # no lists are cached in the namespace
+        return True
+
+    list_key = CachedTypePadLinkPromise._list_key(url, generation)
+    ids = IdList.from_cache(cache_get('%s:1' % list_key))
+    if ids is None:
+        return False
+    total = ids.total
+    segments = CachedTypePadLinkPromise._segments(1, total + 2)
+    keys = ['%s:%d' % (list_key, seg_start) for seg_start, seg_end in segments]
+    found = cache_get_many(keys[1:])
+    for key in keys[1:]:
+        segment = IdList.from_cache(found.get(key))
+        if segment is not None and segment.total == total:
+            ids.extend(segment)
+
+    if index is None:
+        index = total + 1
+    ids.insert(index, obj.xid)
+    log.debug("writing %s through to list %s at index %d" % (obj.xid, list_key, index))
+    values = {obj.cache_key: obj}
+    for key, (seg_start, seg_end) in zip(keys, segments):
+        values[key] = ids.segment(seg_start, seg_end).to_cache()
+    cache_set_many(values)
+    return True
+
+
 def _expand_cache_keys(item):
-    if hasattr(item, 'cache_key'):
+    if isinstance(item, CachedTypePadLinkPromise):
+        # lists are invalidated by their namespace's generation
+        value = item.generation_key
+    elif hasattr(item, 'cache_key'):
         value = item.cache_key
     else:
         value = item
     if isinstance(value, list):
         result = []
         for v in value:
-            v = _expand_cache_keys(v)
-            if v is None: continue
-            if not isinstance(v, list): v = [v]
-            result.extend(v)
+            result.extend(_expand_cache_keys(v))
         return result
-    elif value is None:
+    elif not value:
+        # rules use ``x and key`` for keys that don't apply
         return []
     else:
         return [value]
@@ -404,11 +2211,25 @@ def _expand_cache_keys(item):
 class CacheInvalidator(object):
     """General-purpose class for Django cache invalidation.
 
+    Cached lists are invalidated by incrementing the generation of their
+    namespace (see `list_namespace()`), which invalidates every page and
+    filtered view of the list at once. Other keys are deleted.
+
+    When stale-while-revalidate caching is enabled with the
+    `CACHE_SOFT_TIMEOUT` setting, the invalidated keys are marked stale
+    instead of deleted, and lists of the previous generation are served
+    while they are refreshed, unless the invalidator is created with
+    ``stale=False``.
+
+    Keys are invalidated with `invalidate()`, so the invalidations made
+    while handling a request are collected and made together.
+
     """
 
-    def __init__(self, key, signals=None, name=None):
+    def __init__(self, key, signals=None, name=None, stale=True):
         self.key = key
         self.name = name
+        self.stale = stale
 
         # If signals are provided, attach to each of them.
         if signals is not None:
@@ -432,10 +2253,8 @@ class CacheInvalidator(object):
         return _expand_cache_keys(key)
 
     def __call__(self, sender, **kwargs):
-        keys = self.cache_key(sender, **kwargs)
-        for key in keys:
-            log.debug("invalidating key %s" % key)
-            cache.delete(key)
+        for key in self.cache_key(sender, **kwargs):
+            invalidate(key, self.stale)
 
 
 invalidate_rule = CacheInvalidator
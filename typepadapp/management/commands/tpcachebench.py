@@ -0,0 +1,120 @@
+# Copyright (c) 2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import cPickle as pickle
+from optparse import make_option
+from timeit import Timer
+
+from django.core.management.base import BaseCommand
+
+from typepadapp.models import Event
+from typepadapp.caching import encode_object, decode_object
+
+
+def make_event(n):
+    """Builds an `Event` like those on a group's events page: a new post
+    with a long body, posted by a group member."""
+    author = {
+        'objectType': 'User',
+        'id': 'tag:api.typepad.com,2009:6p00000000000%05d' % n,
+        'urlId': '6p00000000000%05d' % n,
+        'displayName': 'Member %d' % n,
+        'preferredUsername': 'member%d' % n,
+        'profilePageUrl': 'http://profile.typepad.com/member%d' % n,
+        'avatarLink': {
+            'url': 'http://up3.typepad.com/6a00000000000%05d-50si' % n,
+            'width': 50,
+            'height': 50,
+        },
+    }
+    content = '<p>%s</p>' % ' '.join(['Paragraph %d of post %d.' % (i, n) for i in range(40)])
+    post = {
+        'objectType': 'Post',
+        'id': 'tag:api.typepad.com,2009:6a00000000000%05d' % n,
+        'urlId': '6a00000000000%05d' % n,
+        'title': 'Post number %d' % n,
+        'content': content,
+        'renderedContent': content,
+        'excerpt': content[:200],
+        'textFormat': 'html',
+        'author': author,
+        'published': '2010-05-01T12:%02d:00Z' % (n % 60),
+        'permalinkUrl': 'http://example.com/posts/%d' % n,
+        'commentCount': n % 7,
+        'favoriteCount': n % 3,
+        'categories': ['news', 'updates'],
+        'groups': ['tag:api.typepad.com,2009:6p0000000000000001'],
+    }
+    return Event.from_dict({
+        'objectType': 'Event',
+        'id': 'tag:api.typepad.com,2009:6e00000000000%05d' % n,
+        'urlId': '6e00000000000%05d' % n,
+        'verb': 'NewAsset',
+        'published': post['published'],
+        'actor': author,
+        'object': post,
+    })
+
+
+class Command(BaseCommand):
+
+    help = ("Compares the cost of reading a page of events from the cache "
+        "as pickled objects and as the data cached by typepadapp.caching.")
+    args = ""
+
+    option_list = BaseCommand.option_list + (
+        make_option('--page-size', dest='page_size', type='int', default=25,
+            help='Number of events on a page (default 25)'),
+        make_option('--repeat', dest='repeat', type='int', default=200,
+            help='Number of pages to read (default 200)'),
+    )
+
+    def handle(self, *args, **options):
+        events = [make_event(n) for n in range(options['page_size'])]
+        for event in events:
+            event._location = 'https://api.typepad.com/events/%s.json' % event.url_id
+            event._delivered = True
+
+        pickled = [pickle.dumps(event, pickle.HIGHEST_PROTOCOL) for event in events]
+        encoded = [pickle.dumps(encode_object(event), pickle.HIGHEST_PROTOCOL) for event in events]
+
+        def read_pickled():
+            for value in pickled:
+                pickle.loads(value)
+
+        def read_encoded():
+            for value in encoded:
+                decode_object(pickle.loads(value))
+
+        repeat = options['repeat']
+        for name, values, func in (('pickled objects', pickled, read_pickled),
+                                   ('encoded data', encoded, read_encoded)):
+            elapsed = min(Timer(func).repeat(3, repeat))
+            print "%-16s %7d bytes/page  %8.3f ms/page" % (name,
+                sum([len(value) for value in values]), elapsed * 1000 / repeat)
@@ -30,6 +30,8 @@
 import logging
 import random
 import sys
+import threading
+import time
 from types import MethodType
 from urlparse import urlparse
 from urllib import urlencode, quote
@@ -153,65 +155,145 @@ class UserAgentMiddleware(object):
         return None
 
 
-class ApplicationMiddleware(object):
+# the application and group this process runs for, with the time they were
+# fetched from the API
+discovered = None
+discovery_lock = threading.Lock()
+discovery_refreshing = False
+
+
+def _fetch_app_and_group():
+    log = logging.getLogger('.'.join((__name__, 'discover_app_and_group')))
+    log.info('Initializing TypePad application info...')
+
+    # Grab the group and app with the default credentials.
+    consumer = oauth.OAuthConsumer(settings.OAUTH_CONSUMER_KEY,
+        settings.OAUTH_CONSUMER_SECRET)
+    token = oauth.OAuthToken(settings.OAUTH_GENERAL_PURPOSE_KEY,
+        settings.OAUTH_GENERAL_PURPOSE_SECRET)
+    backend = urlparse(settings.BACKEND_URL)
+    typepad.client.clear_credentials()
+    typepad.client.add_credentials(consumer, token, domain=backend[1])
+
+    typepad.client.batch_request()
+    try:
+        api_key = typepad.ApiKey.get_by_api_key(
+            settings.OAUTH_CONSUMER_KEY)
+        token = typepad.AuthToken.get_by_key_and_token(
+            settings.OAUTH_CONSUMER_KEY,
+            settings.OAUTH_GENERAL_PURPOSE_KEY)
+        typepad.client.complete_batch()
+    except Exception, exc:
+        log.error('Error loading Application %s: %s' % (settings.OAUTH_CONSUMER_KEY, str(exc)))
+        raise
+
+    app = api_key.owner
+    if token.target_object and isinstance(token.target_object, typepadapp.models.groups.Group):
+        group = token.target_object
+        log.info("Running for app \"%s\" (%s), group \"%s\" (%s)" % (app.name, app.id, group.display_name, group.url_id))
+    else:
+        group = None
+        log.info("Running for app \"%s\" (%s), no group" % (app.name, app.id))
+    return app, group, time.time()
 
-    def __init__(self):
-        self.app = None
-        self.group = None
-
-    def discover_app_and_group(self, request):
-        log = logging.getLogger('.'.join((self.__module__, self.__class__.__name__)))
-
-        # check for a cached app/group first
-        app_key = 'application:%s' % settings.OAUTH_CONSUMER_KEY
-        group_key = 'group:%s' % settings.OAUTH_CONSUMER_KEY
-
-        # we cache in-process and in cache to support both situtations
-        # where a cache is unavailable (cache is dummy), and situtations
-        # where the application persistence is poor (Google App Engine)
-        app = self.app or cache.get(app_key)
-        group = self.group or cache.get(group_key)
-        if app is None:
-            log.info('Initializing TypePad application info...')
-
-            # Grab the group and app with the default credentials.
-            consumer = oauth.OAuthConsumer(settings.OAUTH_CONSUMER_KEY,
-                settings.OAUTH_CONSUMER_SECRET)
-            token = oauth.OAuthToken(settings.OAUTH_GENERAL_PURPOSE_KEY,
-                settings.OAUTH_GENERAL_PURPOSE_SECRET)
-            backend = urlparse(settings.BACKEND_URL)
-            typepad.client.clear_credentials()
-            typepad.client.add_credentials(consumer, token, domain=backend[1])
-
-            typepad.client.batch_request()
+
+def _discover(wait=True):
+    """Returns the application and group from the cache, or fetches them.
+
+    Only the process holding the discovery lease fetches them from the API,
+    and caches them for other processes. Once they're half as old as
+    `LONG_TERM_CACHE_PERIOD`, the lease holder fetches them again while
+    other processes keep using the cached ones. If nothing is cached and
+    ``wait`` is true, other processes wait a few seconds for the lease
+    holder to cache them; otherwise, ``None`` is returned.
+
+    """
+    # we cache in-process and in cache to support both situtations
+    # where a cache is unavailable (cache is dummy), and situtations
+    # where the application persistence is poor (Google App Engine)
+    key = 'discovery:%s' % settings.OAUTH_CONSUMER_KEY
+    lease = 'lease:%s' % key
+    value = cache.get(key)
+    if value is not None and value[2] + settings.LONG_TERM_CACHE_PERIOD / 2 > time.time():
+        return value
+
+    if cache.add(lease, True, 60):
+        try:
+            value = _fetch_app_and_group()
+            cache.set(key, value, settings.LONG_TERM_CACHE_PERIOD)
+        finally:
+            cache.delete(lease)
+        return value
+    if value is not None or not wait:
+        # still usable while the lease holder fetches them again
+        return value
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        time.sleep(0.1)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return _fetch_app_and_group()
+
+
+def _refresh_discovery():
+    global discovered, discovery_refreshing
+    try:
+        try:
+            value = _discover(wait=False)
+            if value is not None:
+                discovered = value
+        except Exception, exc:
+            log.error('Error refreshing TypePad application info: %s' % str(exc))
+    finally:
+        discovery_refreshing = False
+
+
+def discover_app_and_group():
+    """Returns the application and group this process runs for.
+
+    They're discovered once per process, normally when the server starts
+    (see `typepadapp.utils.loading.discover_application()`), by one thread
+    while any others wait. Before they expire, they're refreshed in a
+    background thread, so requests never wait for them again.
+
+    """
+    global discovered, discovery_refreshing
+    value = discovered
+    if value is None:
+        discovery_lock.acquire()
+        try:
+            if discovered is None:
+                discovered = _discover()
+            value = discovered
+        finally:
+            discovery_lock.release()
+    elif value[2] + settings.LONG_TERM_CACHE_PERIOD / 2 < time.time():
+        discovery_lock.acquire()
+        try:
+            refresh = not discovery_refreshing
+            discovery_refreshing = True
+        finally:
+            discovery_lock.release()
+        if refresh:
+            thread = threading.Thread(target=_refresh_discovery)
+            thread.setDaemon(True)
             try:
-                api_key = typepad.ApiKey.get_by_api_key(
-                    settings.OAUTH_CONSUMER_KEY)
-                token = typepad.AuthToken.get_by_key_and_token(
-                    settings.OAUTH_CONSUMER_KEY,
-                    settings.OAUTH_GENERAL_PURPOSE_KEY)
-                typepad.client.complete_batch()
-            except Exception, exc:
-                log.error('Error loading Application %s: %s' % (settings.OAUTH_CONSUMER_KEY, str(exc)))
-                raise
-
-            app = api_key.owner
-            cache.set(app_key, app, settings.LONG_TERM_CACHE_PERIOD)
-
-            if token.target_object and isinstance(token.target_object, typepadapp.models.groups.Group):
-                group = token.target_object
-                cache.set(group_key, group, settings.LONG_TERM_CACHE_PERIOD)
-                log.info("Running for app \"%s\" (%s), group \"%s\" (%s)" % (app.name, app.id, group.display_name, group.url_id))
-            else:
-                group = None
-                log.info("Running for app \"%s\" (%s), no group" % (app.name, app.id))
+                thread.start()
+            except Exception:
+                # no threads here (such as on Google App Engine)
+                _refresh_discovery()
 
-        if settings.SESSION_COOKIE_NAME is None:
-            settings.SESSION_COOKIE_NAME = "sg_%s" % app.id
+    app, group = value[0], value[1]
+    if settings.SESSION_COOKIE_NAME is None:
+        settings.SESSION_COOKIE_NAME = "sg_%s" % app.id
+    typepadapp.models.APPLICATION = app
+    typepadapp.models.GROUP = group
+    return app, group
 
-        self.app = app
-        self.group = group
-        return app, group
+
+class ApplicationMiddleware(object):
 
     def process_request(self, request):
         """Adds the application and group to the request."""
@@ -219,10 +301,7 @@ class ApplicationMiddleware(object):
         if request.path.find('/static/') == 0:
             return None
 
-        app, group = self.discover_app_and_group(request)
-
-        typepadapp.models.APPLICATION = app
-        typepadapp.models.GROUP = group
+        app, group = discover_app_and_group()
 
         request.application = app
         request.group = group
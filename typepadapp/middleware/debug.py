@@ -195,13 +195,32 @@ def get_typepad_client(superclass):
         requests = []
 
         def batch_request(self):
-            request = super(TypePadClientStatTracker, self).batch_request()
-            request.opened_stack = tidy_stacktrace(traceback.extract_stack())
+            result = super(TypePadClientStatTracker, self).batch_request()
+            # a joined batch keeps the stack of the code that opened it
+            if not hasattr(self.batchrequest, 'opened_stack'):
+                self.batchrequest.opened_stack = tidy_stacktrace(traceback.extract_stack())
+            return result
 
         def complete_batch(self):
             self.batchrequest.closed_stack = tidy_stacktrace(traceback.extract_stack())
-            self.requests.append(self.batchrequest)
-            super(TypePadClientStatTracker, self).complete_batch()
+            # completing a joined batch passes through here again when
+            # the batch is sent, and that's still one batch request
+            if self.batchrequest not in self.requests:
+                self.requests.append(self.batchrequest)
+            batchrequest = self.batchrequest
+            try:
+                super(TypePadClientStatTracker, self).complete_batch()
+            finally:
+                sub_batches = getattr(batchrequest, 'sub_batches', None)
+                if sub_batches:
+                    # the batch was sent as concurrent sub-batches
+                    batchrequest.stats.update({
+                        'count': sum([len(sub.requests) for sub in sub_batches]),
+                        'subrequests': [request for sub in sub_batches
+                                        for request in sub.requests if request.executed],
+                        'time': max([sub.stats.get('time', 0) for sub in sub_batches]),
+                        'sub_batch_times': [sub.stats.get('time') for sub in sub_batches],
+                    })
     return TypePadClientStatTracker
 
 
@@ -277,6 +296,16 @@ class DebugToolbar(object):
     def typepad_webserver(self):
         return self._get_typepad_stat('typepad_webserver')
 
+    def cache_stats(self):
+        "The caching events counted while handling this request."
+        from typepadapp.caching import stats
+        return sorted(stats.current.items())
+
+    def cache_compression_ratio(self):
+        "The ratio to which this process has compressed large cached values."
+        from typepadapp.utils.compression import compression_ratio
+        return compression_ratio()
+
     def render_toolbar(self, request):
         return render_to_string('debug_toolbar.html', {
             'toolbar': self,
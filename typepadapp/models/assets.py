@@ -298,7 +298,9 @@ class Event(typepad.Event):
 ### Cache support
 
 if settings.FRONTEND_CACHING:
-    from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import cache_link, cache_object, invalidate_rule, invalidate
+    from typepadapp.caching import cache_list_insert, link_cache_key, link_url
+    from typepadapp.caching import list_references_key, object_cache_key
 
     # this is so we cache all Post, Video, Comment, etc., assets using
     # the same namespace.
@@ -308,7 +310,7 @@ if settings.FRONTEND_CACHING:
     Asset.get_by_url_id = cache_object(Asset.get_by_url_id)
     asset_invalidator_for_comments = invalidate_rule(
         key=lambda sender, instance=None, **kwargs:
-            isinstance(instance, Comment) and Asset.get_by_url_id(instance.in_reply_to.url_id),
+            isinstance(instance, Comment) and object_cache_key('Asset', instance.in_reply_to.url_id),
         signals=[signals.asset_created, signals.asset_deleted],
         name="asset object invalidation for commenting")
     asset_invalidator_for_favorites = invalidate_rule(
@@ -317,15 +319,32 @@ if settings.FRONTEND_CACHING:
         name="asset object invalidation for favoriting")
 
     Asset.comments = cache_link(Asset.comments)
+    comments_invalidation_signals = [signals.asset_created, signals.asset_deleted]
+    if getattr(settings, 'LIST_CACHE_WRITE_THROUGH', True):
+        def asset_comments_writer(sender, instance=None, **kwargs):
+            if not isinstance(instance, Comment):
+                return
+            parent_id = instance.in_reply_to.url_id
+            if not cache_list_insert(link_url('assets', parent_id, 'comments'), instance):
+                invalidate(link_cache_key('assets', parent_id, 'comments'))
+        signals.asset_created.connect(asset_comments_writer)
+        comments_invalidation_signals = [signals.asset_deleted]
     asset_comments_invalidator = invalidate_rule(
         key=lambda sender, instance=None, **kwargs:
-            isinstance(instance, Comment) and Asset.get_by_url_id(instance.in_reply_to.url_id).comments,
-        signals=[signals.asset_created, signals.asset_deleted],
+            isinstance(instance, Comment) and link_cache_key('assets', instance.in_reply_to.url_id, 'comments'),
+        signals=comments_invalidation_signals,
         name="asset comments list invalidation for commenting")
 
     Asset.favorites = cache_link(Asset.favorites)
     # cache invalidation for asset object cache when a favorite is created/deleted
     asset_favorites_invalidator = invalidate_rule(
-        key=lambda sender, parent=None, **kwargs: parent and parent.favorites,
+        key=lambda sender, parent=None, **kwargs: parent and link_cache_key('assets', parent.url_id, 'favorites'),
         signals=[signals.favorite_created, signals.favorite_deleted],
         name="asset favorite list invalidation for favoriting")
+
+    # remove deleted assets and favorites from every cached list they're in,
+    # such as other users' notifications and favorites
+    asset_references_invalidator = invalidate_rule(
+        key=lambda sender, instance=None, **kwargs: instance and list_references_key(instance.xid),
+        signals=[signals.asset_deleted, signals.favorite_deleted],
+        name="list invalidation for deleted assets and favorites")
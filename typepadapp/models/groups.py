@@ -28,6 +28,7 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import logging
+import threading
 import time
 
 from django.core.cache import cache
@@ -36,58 +37,117 @@ import typepad
 
 from typepadapp.models.assets import Event
 from typepadapp import signals
+from typepadapp.utils.compression import compress, decompress
 
 
 log = logging.getLogger(__name__)
 
 
-class Group(typepad.Group):
+class AdminIndex(object):
 
-    admin_list = None
-    admin_list_time = 0
+    """The administrators of a group: their `Relationship` objects, and the
+    set of their user ids to check users against."""
 
-    def __init__(self, *args, **kwargs):
-        super(Group, self).__init__(*args, **kwargs)
-        self.admin_list = None
-        self.admin_list_time = 0
+    def __init__(self, admin_list):
+        self.admin_list = admin_list
+        self.ids = frozenset([admin.target.id for admin in admin_list])
+        self.time = time.time()
+
+    def __contains__(self, user):
+        return user.id in self.ids
+
+    @property
+    def expired(self):
+        return self.time + settings.LONG_TERM_CACHE_PERIOD < time.time()
 
-    def admins(self):
-        # cache in-process for up to 5 minutes
-        if self.admin_list_time + settings.LONG_TERM_CACHE_PERIOD < time.time():
-            admin_list_key = self.cache_key + ':admin_list'
 
-            admin_list = cache.get(admin_list_key)
-            if admin_list is None:
-                admin_list = self.memberships.filter(admin=True, batch=False, cache=False)
-                log.debug('No admin list in the cache; fetching %r from server', admin_list._location)
-                admin_list.deliver()
-                cache.set(admin_list_key, admin_list)
+# admin indexes by group URL id, shared by all the requests the process
+# handles
+admin_indexes = {}
+admin_indexes_lock = threading.Lock()
 
-            self.admin_list = admin_list
-            self.admin_list_time = time.time()
-            log.debug("Yay, got admin list %r, which we're hard caching until %r",
-                admin_list, self.admin_list_time)
 
-        return self.admin_list
+class Group(typepad.Group):
+
+    def admins(self):
+        """Returns the `Relationship` objects of the group's administrators."""
+        return self.admin_index().admin_list
+
+    def is_admin(self, user):
+        """Returns whether the TypePad user ``user`` administers the group."""
+        return user in self.admin_index()
+
+    def admin_index(self):
+        """Returns the `AdminIndex` of the group's administrators.
+
+        The index is kept in-process for `LONG_TERM_CACHE_PERIOD` seconds,
+        across requests and instances of the group. When it has to be
+        refreshed, only one thread fetches the list while the others wait
+        for it, and the list is shared with other processes through the
+        cache.
+
+        """
+        index = admin_indexes.get(self.url_id)
+        if index is not None and not index.expired:
+            return index
+
+        admin_indexes_lock.acquire()
+        try:
+            # another thread may have refreshed it while we waited
+            index = admin_indexes.get(self.url_id)
+            if index is None or index.expired:
+                index = AdminIndex(self._admin_list())
+                admin_indexes[self.url_id] = index
+                log.debug("Yay, got admin list %r, which we're hard caching until %r",
+                    index.admin_list, index.time + settings.LONG_TERM_CACHE_PERIOD)
+        finally:
+            admin_indexes_lock.release()
+        return index
+
+    def _admin_list(self):
+        admin_list_key = self.cache_key + ':admin_list'
+        admin_list = decompress(cache.get(admin_list_key))
+        if admin_list is None:
+            admin_list = self.memberships.filter(admin=True, batch=False, cache=False)
+            log.debug('No admin list in the cache; fetching %r from server', admin_list._location)
+            admin_list.deliver()
+            cache.set(admin_list_key, compress(admin_list))
+        return admin_list
+
+
+def invalidate_admin_index(sender, group=None, **kwargs):
+    """Discards the administrators of ``group`` kept in-process and in the
+    cache, so they're fetched again when next checked."""
+    if group is None:
+        return
+    admin_indexes.pop(group.url_id, None)
+    cache.delete(group.cache_key + ':admin_list')
+
+signals.member_banned.connect(invalidate_admin_index)
+signals.member_unbanned.connect(invalidate_admin_index)
 
 
 ### Cache support
 
 if settings.FRONTEND_CACHING:
     from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import link_cache_key
 
     # Cache population/invalidation
     Group.get_by_url_id = cache_object(Group.get_by_url_id)
     # invalidate with: signals.group_webhook
 
-    Group.events = cache_link(Group.events)
+    Group.events = cache_link(Group.events, head_refresh=True)
+    # new posts can't be written through like comments are (see
+    # LIST_CACHE_WRITE_THROUGH): the id of the event the API makes for a post
+    # isn't in the response to posting it
     group_events_invalidator = invalidate_rule(
-        key=lambda sender, group=None, **kwargs: group and group.events,
+        key=lambda sender, group=None, **kwargs: group and link_cache_key('groups', group.url_id, 'events'),
         signals=[signals.asset_created, signals.asset_deleted],
         name="Group events invalidation for asset_created, asset_deleted signal")
 
     Group.memberships = cache_link(Group.memberships)
     memberships_invalidator = invalidate_rule(
-        key=lambda sender, group=None, **kwargs: group and group.memberships,
+        key=lambda sender, group=None, **kwargs: group and link_cache_key('groups', group.url_id, 'memberships'),
         signals=[signals.member_banned, signals.member_unbanned, signals.member_joined, signals.member_left],
         name="group memberships for member_banned, member_unbanned, member_joined, member_left signals")
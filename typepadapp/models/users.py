@@ -75,10 +75,7 @@ class User(typepad.User):
 
     @property
     def is_superuser(self):
-        for admin in typepadapp.models.GROUP.admins():
-            if self.id == admin.target.id:
-                return True
-        return False
+        return typepadapp.models.GROUP.is_admin(self)
 
     @property
     def is_featured_member(self):
@@ -302,10 +299,7 @@ class UserProfile(typepad.UserProfile):
 
     @property
     def is_superuser(self):
-        for admin in typepadapp.models.GROUP.admins():
-            if self.id == admin.target.id:
-                return True
-        return False
+        return typepadapp.models.GROUP.is_admin(self)
 
     @property
     def is_featured_member(self):
@@ -328,35 +322,37 @@ class UserProfile(typepad.UserProfile):
 
 if settings.FRONTEND_CACHING:
     from typepadapp.caching import cache_link, cache_object, invalidate_rule
+    from typepadapp.caching import link_cache_key, object_cache_key
     from typepadapp import signals
 
-    def make_user_alias_cache_key(self):
-        """Attempts to use a caching key of the user's username, if available."""
-        return "objectcache:%s:%s" % (self.cache_namespace, self.preferred_username or self.url_id)
-    User.cache_key = property(make_user_alias_cache_key)
-    UserProfile.cache_key = property(make_user_alias_cache_key)
+    def make_user_cache_key(self):
+        """Uses a caching key of the user's URL identifier, which users
+        requested by username are cached under too."""
+        return object_cache_key(self.cache_namespace, self.url_id)
+    User.cache_key = property(make_user_cache_key)
+    UserProfile.cache_key = property(make_user_cache_key)
 
-    User.get_by_url_id = cache_object(User.get_by_url_id)
+    User.get_by_url_id = cache_object(User.get_by_url_id, alias='users')
     user_invalidator = invalidate_rule(
         key=lambda sender, instance=None, group=None, **kwargs: instance,
         signals=[signals.member_banned, signals.member_unbanned],
         name="user cache invalidation for member_banned, member_unbanned signals")
 
-    UserProfile.get_by_url_id = cache_object(UserProfile.get_by_url_id)
+    UserProfile.get_by_url_id = cache_object(UserProfile.get_by_url_id, alias='users')
     user_profile_invalidator = invalidate_rule(
-        key=lambda sender, instance=None, group=None, **kwargs: UserProfile.get_by_url_id(instance.preferred_username or instance.url_id),
+        key=lambda sender, instance=None, group=None, **kwargs:
+            instance and object_cache_key('UserProfile', instance.url_id),
         signals=[signals.member_banned, signals.member_unbanned],
         name="user profile cache invalidation for member_banned, member_unbanned signals")
 
-    User.events = cache_link(User.events)
+    User.events = cache_link(User.events, head_refresh=True)
     user_events_invalidator = invalidate_rule(
         key=lambda sender, group=None, instance=None, **kwargs:
-            instance and instance.author and group and [instance.author.notifications.filter(by_group=group),
-                instance.author.preferred_username and User.get_by_url_id(instance.author.preferred_username).notifications.filter(by_group=group)],
+            instance and instance.author and group and link_cache_key('users', instance.author.url_id, 'notifications'),
         signals=[signals.asset_created, signals.asset_deleted],
         name="user notifications for group cache invalidation for asset_created, asset_deleted signals")
 
-    User.notifications = cache_link(User.notifications)
+    User.notifications = cache_link(User.notifications, head_refresh=True)
     # signals.asset_created, signals.asset_deleted
 
     # We can't effectively signal to invalidate these lists because
@@ -364,8 +360,7 @@ if settings.FRONTEND_CACHING:
     User.memberships = cache_link(User.memberships)
     user_memberships_invalidator = invalidate_rule(
         key=lambda sender, instance=None, group=None, **kwargs:
-            instance and group and [User.get_by_url_id(instance.url_id).group_memberships(group),
-                instance.preferred_username and User.get_by_url_id(instance.preferred_username).group_memberships(group)],
+            instance and group and link_cache_key('users', instance.url_id, 'memberships'),
         signals=[signals.member_banned, signals.member_unbanned, signals.member_joined, signals.member_left],
         name="user membership invalidation for member_banned, member_unbanned, member_joined, member_left signals")
 
@@ -381,7 +376,7 @@ if settings.FRONTEND_CACHING:
 
     User.favorites = cache_link(User.favorites)
     user_favorites_invalidator = invalidate_rule(
-        key=lambda sender, instance=None, **kwargs: instance and [instance.author.favorites,
-            instance.author.preferred_username and User.get_by_url_id(instance.author.preferred_username).favorites],
+        key=lambda sender, instance=None, **kwargs:
+            instance and link_cache_key('users', instance.author.url_id, 'favorites'),
         signals=[signals.favorite_created, signals.favorite_deleted],
         name="user favorites stream for favorite created/deleted signals")
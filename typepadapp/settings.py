@@ -105,6 +105,30 @@ variable can be used to turn this setting off on a per-process basis.
 
 """
 
+BATCH_SPLIT_SIZE = 0
+"""The most subrequests to send in one batch request before splitting it into
+sub-batches that are sent concurrently.
+
+The TypePad batch endpoint makes the subrequests of a batch one after the
+other, so a batch of many subrequests takes as long as all of them put
+together. When a batch (after any subrequests answered from the front-end
+cache are removed) has more than this many subrequests, it is split into
+sub-batches of at most this many subrequests each, which are sent at the same
+time from `BATCH_SPLIT_THREADS` threads. The responses are still given to the
+subrequests in the order they were made, in the request's own thread.
+
+This setting only has an effect when `FRONTEND_CACHING` is on. By default,
+batches are never split (``0``).
+
+"""
+
+BATCH_SPLIT_THREADS = 4
+"""The most sub-batches of a split batch request to send at once.
+
+See `BATCH_SPLIT_SIZE`. By default, up to 4 sub-batches are sent at once.
+
+"""
+
 FRONTEND_CACHING = True
 """Setting that controls whether to use the Django caching framework for
 caching object data retrieved from the TypePad API."""
@@ -113,6 +137,216 @@ LONG_TERM_CACHE_PERIOD = 60 * 60 * 24  # 1 day
 """Defines a cache timeout (in seconds) for cacheable items that can be
 cached more aggressively."""
 
+DISCOVER_APPLICATION_AT_START = True
+"""Whether to discover the TypePad application and group the site runs for
+when the server starts, instead of on the first request.
+
+Discovery runs from the project's ``app.wsgi`` script (recreate older
+scripts with the ``refreshwsgi`` command), so management commands and tests
+never talk to the TypePad API when they start. The application and group
+are then refreshed in the background before they expire (see
+`LONG_TERM_CACHE_PERIOD`), so requests never wait for them.
+
+"""
+
+CACHE_POLICIES = {}
+"""Cache timeouts and backends for namespaces of values cached by
+`FRONTEND_CACHING`.
+
+This setting is a dictionary of policies keyed on namespace. The namespaces
+are:
+
+* the cache namespaces of TypePad objects, such as ``'Asset'``, ``'User'``
+  and ``'Group'``
+
+* list endpoints, as the noun and link of their URLs, such as
+  ``'groups/events'`` or ``'users/notifications'``
+
+* ``'httpcache_'`` for the responses stored in the HTTP cache
+
+Each policy is a dictionary that may contain a ``'timeout'`` (in seconds)
+and a ``'backend'`` (a Django cache backend URI, such as ``'locmem:///'``)
+to use for the values in the namespace instead of those of the default
+Django cache. For example::
+
+    CACHE_POLICIES = {
+        'Group': {'timeout': 60 * 60 * 24},
+        'User': {'timeout': 60 * 60 * 3},
+        'groups/events': {'timeout': 60 * 5},
+        'httpcache_': {'backend': 'locmem:///'},
+    }
+
+By default, all values are cached in the default Django cache, with its
+default timeout.
+
+"""
+
+LOCAL_CACHE_MAX_ENTRIES = 0
+"""The number of TypePad objects to keep in an in-process cache in front of
+the Django cache.
+
+When `FRONTEND_CACHING` is enabled and this setting is nonzero, objects
+cached under ``objectcache:`` keys are also kept in a small least recently
+used cache inside each process, so objects read on every page (such as the
+group and its featured member) needn't be fetched from the shared cache on
+every request. Cache invalidation evicts these entries only in the process
+that performs it; other processes hold them for at most
+`LOCAL_CACHE_TIMEOUT` seconds.
+
+By default, the in-process cache is disabled (``0``).
+
+"""
+
+LOCAL_CACHE_TIMEOUT = 30
+"""The number of seconds an object is kept in the in-process cache enabled
+by `LOCAL_CACHE_MAX_ENTRIES`.
+
+By default, objects are kept for 30 seconds.
+
+"""
+
+CACHE_SOFT_TIMEOUT = None
+"""The number of seconds a value cached by `FRONTEND_CACHING` is considered
+fresh.
+
+When this setting is a number, cached lists and objects older than this
+period are still served from the cache, but the API request for them is
+made again after the response has been sent, refreshing the cached value.
+Each segment of a cached list (see `LIST_CACHE_SEGMENT_SIZE`) is fresh for
+this period from when it was last written. Cache invalidation then marks
+cached values stale instead of deleting them, so the next visitor after an
+invalidation doesn't wait on the API.
+
+By default, stale-while-revalidate caching is disabled (`None`).
+
+"""
+
+CACHE_REFRESH_IN_THREAD = False
+"""Whether to refresh stale cached values in a background thread.
+
+When `CACHE_SOFT_TIMEOUT` is set and this setting is `True`, stale values
+served during a request are refreshed in a new thread, using the
+application's own OAuth credentials. Otherwise they are refreshed in the
+request's own thread when the request is finished, using the credentials
+of the request.
+
+By default, stale values are refreshed when the request is finished
+(`False`).
+
+"""
+
+LIST_CACHE_SEGMENT_SIZE = 500
+"""The number of item identifiers to store under each cache key of a cached
+list.
+
+Cached lists are split into segments of this many identifiers, so very long
+lists don't exceed the cache's item size limit, and reading a page of a
+list loads only the segments the page falls in.
+
+By default, lists are cached in segments of 500 identifiers.
+
+"""
+
+LIST_CACHE_HEAD_WINDOW = 10
+"""The number of items to request when refreshing the head of a cached event
+stream.
+
+Lists cached with ``cache_link(..., head_refresh=True)``, such as group
+events and user notifications, mostly change only at their head. When the
+first page of one is invalidated while its items are still cached, only
+this many of its newest items are requested, and the new ones are spliced
+in front of the cached items. If the window doesn't overlap the cached
+items, the whole page is requested again.
+
+By default, 10 items are requested.
+
+"""
+
+LIST_CACHE_WRITE_THROUGH = True
+"""Whether to add newly created comments to the cached comment lists of
+their assets, instead of invalidating those lists.
+
+When enabled, a comment posted to an asset is appended to the asset's cached
+comment list and cached itself, so the asset page shown right after posting
+is still served from the cache.
+
+Only comments are written through. Lists of events, such as group events
+and notifications, hold the events the API creates for new posts, and the
+response to posting doesn't say which event that is, so those lists are
+still invalidated whenever a post is created.
+
+By default, comments are written through to the cache.
+
+"""
+
+LIST_CACHE_REFERENCES_MAX = 20
+"""The number of cached lists to remember for each object they contain.
+
+When a list is cached, the namespaces of the lists (see
+`typepadapp.caching.list_namespace()`) each of its items and their embedded
+objects appear in are recorded under the item's identifier, so that
+invalidating ``list_references_key(xid)`` invalidates exactly the lists
+that contained the object, as when it is deleted. Only the most recently
+cached lists are remembered for objects that appear in more lists than
+this.
+
+Set to ``0`` to disable recording list references. By default, 20 lists
+are remembered for each object.
+
+"""
+
+CACHE_COMPRESS_MIN_SIZE = 8 * 1024  # 8 KB
+"""The size (in bytes) from which values stored in the cache are compressed.
+
+Cached TypePad objects and lists, the group's admin list, and HTTP responses
+stored in the HTTP cache are compressed with zlib when their data is at
+least this large. Compressed values are flagged as such, so values stored
+before compression was enabled or changed can still be read.
+
+Set this setting to `None` to disable compression. By default, values of 8 KB
+or more are compressed.
+
+"""
+
+CACHE_NOT_FOUND_TIMEOUT = 60
+"""The number of seconds to remember that a cached TypePad object was not
+found.
+
+When an API request for an object fetched with a cached method such as
+`Asset.get_by_url_id()` fails with a 404 response, that is cached for this
+period, so later requests for the object in a batch raise `NotFound` without
+making the API request again. Invalidating the object's cache key also
+forgets that it was not found.
+
+Set this setting to `None` to disable negative caching. By default, missing
+objects are remembered for a minute.
+
+"""
+
+CACHE_FILL_LEASE_TIMEOUT = None
+"""The number of seconds one process may hold the lease for filling a cache
+key.
+
+When this setting is a number, only the process holding the lease for a
+missing or stale cached list or object makes the API request for it. Other
+processes that miss the cache for the same key wait up to `CACHE_FILL_WAIT`
+seconds for the value to be filled, and serve a stale value instead of
+refreshing it themselves. A lease left by a process that died expires after
+this period.
+
+By default, cache fills are not coordinated (`None`).
+
+"""
+
+CACHE_FILL_WAIT = 0.5
+"""The number of seconds to wait for another process to fill a cache key
+leased under `CACHE_FILL_LEASE_TIMEOUT`.
+
+When the wait is over, the API request is made anyway. By default, requests
+wait half a second.
+
+"""
+
 WELCOME_URL = None
 """A URL for a welcome page to which to send newly registered site members.
 
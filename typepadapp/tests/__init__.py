@@ -39,6 +39,7 @@ from xml.dom.minidom import parse
 from django.conf import settings
 import django.core.cache
 from django.template import Context, Template
+import httplib2
 import mox
 from oauth import oauth
 
@@ -222,3 +223,420 @@ class OAuthTests(unittest.TestCase):
         }
         cb_url = '%s?%s' % ('http://test.example.com/', urlencode(params))
         self.assertCallback(cb_url, 'url with query encoded with urllib.urlencode encodes right')
+
+
+class LocalCacheTests(unittest.TestCase):
+
+    def test_least_recently_used_are_culled(self):
+        from typepadapp.caching import LocalCache
+        local = LocalCache(max_entries=4, timeout=30)
+        for i in range(4):
+            local.set('key%d' % i, i)
+        local.get('key0')
+        local.set('key4', 4)
+
+        self.assertEquals(local.get('key1'), None)
+        self.assertEquals(local.get('key0'), 0)
+        self.assertEquals(local.get('key4'), 4)
+
+    def test_expired_entries_are_misses(self):
+        from typepadapp.caching import LocalCache
+        local = LocalCache(max_entries=4, timeout=-1)
+        local.set('key', 'value')
+        self.assertEquals(local.get('key'), None)
+
+    def test_values_are_copies(self):
+        from typepadapp.caching import LocalCache
+        local = LocalCache(max_entries=4, timeout=30)
+        local.set('key', {'a': 1})
+        local.get('key')['a'] = 2
+        self.assertEquals(local.get('key'), {'a': 1})
+
+
+class IdListTests(unittest.TestCase):
+
+    def test_ranges_are_merged(self):
+        from typepadapp.caching import IdList
+        ids = IdList(100)
+        ids.update(1, ['a1', 'a2'])
+        ids.update(5, ['a5'])
+        ids.update(3, ['a3', 'a4'])
+
+        self.assertEquals(len(ids.runs), 1)
+        self.assertEquals([ids.get(idx) for idx in range(1, 7)],
+            ['a1', 'a2', 'a3', 'a4', 'a5', None])
+
+    def test_wider_ids_are_repacked(self):
+        from typepadapp.caching import IdList
+        ids = IdList(100)
+        ids.update(1, ['a1'])
+        ids.update(10, ['a10000'])
+
+        self.assertEquals(ids.get(1), 'a1')
+        self.assertEquals(ids.get(10), 'a10000')
+        self.assertEquals(ids.get(5), None)
+
+    def test_round_trip(self):
+        from typepadapp.caching import IdList
+        ids = IdList(3)
+        ids.update(2, ['b', 'c'])
+        ids = IdList.from_cache(ids.to_cache())
+
+        self.assertEquals(ids.total, 3)
+        self.assertEquals([ids.get(idx) for idx in range(1, 4)], [None, 'b', 'c'])
+        self.assertEquals(IdList.from_cache([3, None, 'b', 'c']), None)
+
+    def test_segments_recombine(self):
+        from typepadapp.caching import IdList
+        ids = IdList(10)
+        ids.update(1, ['a%d' % idx for idx in range(1, 11)])
+        first, second = ids.segment(1, 6), ids.segment(6, 11)
+        self.assertEquals(first.get(6), None)
+        self.assertEquals(second.get(5), None)
+
+        first.extend(second)
+        self.assertEquals([first.get(idx) for idx in range(1, 11)],
+            ['a%d' % idx for idx in range(1, 11)])
+
+    def test_insert(self):
+        from typepadapp.caching import IdList
+        ids = IdList(6)
+        ids.update(1, ['a', 'b', 'c'])
+        ids.update(6, ['f'])
+        ids.insert(2, 'new')
+        self.assertEquals(ids.total, 7)
+        self.assertEquals([ids.get(idx) for idx in range(1, 8)],
+            ['a', 'new', 'b', 'c', None, None, 'f'])
+
+
+class CompressionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.min_size = getattr(settings, 'CACHE_COMPRESS_MIN_SIZE', None)
+        settings.CACHE_COMPRESS_MIN_SIZE = 100
+
+    def tearDown(self):
+        settings.CACHE_COMPRESS_MIN_SIZE = self.min_size
+
+    def test_small_values_are_unchanged(self):
+        from typepadapp.utils.compression import compress, decompress
+        self.assertEquals(compress('abc'), 'abc')
+        self.assertEquals(decompress('abc'), 'abc')
+
+    def test_large_values_round_trip(self):
+        from typepadapp.utils.compression import compress, decompress
+        for value in ('a' * 1000, {'entries': ['a' * 10] * 100}):
+            compressed = compress(value)
+            self.assertNotEquals(compressed, value)
+            self.assertEquals(decompress(compressed), value)
+
+
+class CachePolicyTests(unittest.TestCase):
+
+    def test_key_namespaces(self):
+        from typepadapp.caching import key_namespace, object_cache_key
+        self.assertEquals(key_namespace(object_cache_key('Asset', '6a00')), 'Asset')
+        self.assertEquals(key_namespace(
+            'listcache:12:https://api.typepad.com/groups/6p00/events.json:1'),
+            'groups/events')
+        self.assertEquals(key_namespace(
+            'listcache:12:https://api.typepad.com/users/6p00/notifications/@by-group/6p01.json:501'),
+            'users/notifications')
+        self.assertEquals(key_namespace('generation:groups/6p00/events'), None)
+
+    def test_link_cache_key(self):
+        from typepadapp.caching import generation_key, link_cache_key, list_namespace
+        url = 'https://api.typepad.com/users/6p00/notifications/@by-group/6p01.json'
+        self.assertEquals(link_cache_key('users', '6p00', 'notifications'),
+            generation_key(list_namespace(url)))
+
+
+class FakeItem(object):
+
+    def __init__(self, xid):
+        from typepadapp.caching import object_cache_key
+        self.xid = xid
+        self.cache_key = object_cache_key('FakeItem', xid)
+
+
+class FakeList(object):
+
+    def __init__(self, location):
+        self._location = location
+        self.entries = []
+
+    def filter(self, **kwargs):
+        return FakeList(self._location)
+
+    def update_from_response(self, url, entries, total):
+        self.entries = entries
+        self.total_results = total
+
+
+class FakeLink(object):
+
+    class cls(object):
+        class entries(object):
+            class fld(object):
+                cls = FakeItem
+
+    def __init__(self, url):
+        self.url = url
+
+    def __get__(self, obj, type=None, **kwargs):
+        return FakeList(self.url)
+
+
+class ListCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.soft_timeout = getattr(settings, 'CACHE_SOFT_TIMEOUT', None)
+        self.segment_size = getattr(settings, 'LIST_CACHE_SEGMENT_SIZE', 500)
+        settings.CACHE_SOFT_TIMEOUT = 60
+        self.url = 'https://api.typepad.com/groups/test%d/events.json' % id(self)
+
+    def tearDown(self):
+        settings.CACHE_SOFT_TIMEOUT = self.soft_timeout
+        settings.LIST_CACHE_SEGMENT_SIZE = self.segment_size
+
+    def page(self, start, count=10):
+        from typepadapp.caching import CachedTypePadLinkPromise
+        promise = CachedTypePadLinkPromise(FakeLink(self.url), None)
+        return promise.filter(start_index=start, max_results=count)
+
+    def items(self, prefix, start, count=10):
+        return [FakeItem('%s%d' % (prefix, idx)) for idx in range(start, start + count)]
+
+    def fill(self, start, prefix, total=20):
+        page = self.page(start)
+        page._deliver_from_cache()
+        page._cache_callback(self.url, self.items(prefix, start), total)
+
+    def test_refresh_does_not_revive_previous_generation(self):
+        from typepadapp.caching import bump_generation, list_namespace
+        self.fill(1, 'o')
+        self.fill(11, 'o')
+        bump_generation(list_namespace(self.url))
+
+        page = self.page(1)
+        self.assert_(page._deliver_from_cache())
+        self.assert_(page._stale)
+        page._cache_callback(self.url,
+            [FakeItem('n%d' % idx) for idx in range(1, 11)], 20)
+
+        # the second page was only cached in the previous generation
+        page = self.page(11)
+        self.assert_(not page._deliver_from_cache() or page._stale)
+
+    def test_refresh_marks_only_its_segments_fresh(self):
+        from typepadapp.caching import fresh_key
+        settings.LIST_CACHE_SEGMENT_SIZE = 10
+        self.fill(1, 'o')
+        self.fill(11, 'o')
+        # let the soft timeout pass for both pages
+        page = self.page(1)
+        for key in page._segment_keys(page.cache_key, 1, 21):
+            django.core.cache.cache.delete(fresh_key(key))
+
+        page = self.page(1)
+        self.assert_(page._deliver_from_cache())
+        self.assert_(page._stale)
+        page._cache_callback(self.url,
+            [FakeItem('o%d' % idx) for idx in range(1, 11)], 20)
+
+        page = self.page(1)
+        self.assert_(page._deliver_from_cache())
+        self.assert_(not page._stale)
+        page = self.page(11)
+        self.assert_(page._deliver_from_cache())
+        self.assert_(page._stale)
+
+    def test_not_found_items_are_misses(self):
+        from typepadapp.caching import NOT_FOUND, cache_set
+        self.fill(1, 'o')
+        cache_set(FakeItem('o3').cache_key, NOT_FOUND)
+
+        page = self.page(1)
+        self.assert_(not page._deliver_from_cache())
+
+    def test_partial_fill_of_changed_list_is_made_again(self):
+        from typepadapp.caching import CachingCallback
+        self.fill(1, 'o', total=100)
+        self.fill(21, 'o', total=100)
+
+        page = self.page(1, 30)
+        self.failIf(page._deliver_from_cache())
+        self.assertEquals(page._missing_range(), (11, 10))
+        # three items were added to the list since it was cached
+        page._cache_callback(self.url, self.items('n', 11), 103)
+        self.assert_(CachingCallback(page).partial_missed())
+
+        page._cache_callback(self.url, self.items('n', 1, 30), 103)
+        self.assertEquals([item.xid for item in page.entries],
+            [item.xid for item in self.items('n', 1, 30)])
+        self.assertEquals(page.total_results, 103)
+
+        page = self.page(21)
+        self.assert_(page._deliver_from_cache())
+        self.assertEquals([item.xid for item in page.entries],
+            [item.xid for item in self.items('n', 21)])
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        from batchhttp.client import BatchRequest
+        from typepadapp.caching import CachingTypePadClient
+        self.process = BatchRequest.process
+        self.sent = []
+        self.received = []
+        def process(batchrequest, http, endpoint):
+            uris = [request.reqinfo['uri'] for request in batchrequest.requests]
+            self.sent.append(uris)
+            for request in batchrequest.requests:
+                request.callback(request.reqinfo['uri'],
+                    httplib2.Response({'status': '200'}), '')
+        BatchRequest.process = process
+        self.client = CachingTypePadClient()
+
+    def tearDown(self):
+        from batchhttp.client import BatchRequest
+        BatchRequest.process = self.process
+
+    def callback(self, uri, response, body):
+        self.received.append(uri)
+
+    def add(self, uri):
+        self.client.batch({'uri': uri}, self.callback)
+
+    def test_open_and_complete(self):
+        self.client.batch_request()
+        self.add('a')
+        self.client.complete_batch()
+        self.assertEquals(self.sent, [['a']])
+        self.assertEquals(self.received, ['a'])
+        self.failIf(hasattr(self.client, 'batchrequest'))
+
+        # another batch can be opened after
+        self.client.batch_request()
+        self.add('b')
+        self.client.complete_batch()
+        self.assertEquals(self.sent, [['a'], ['b']])
+
+    def test_joined_batch_is_delivered_when_completed(self):
+        self.client.batch_request()
+        self.add('view')
+        self.client.batch_request()
+        self.add('helper')
+        self.client.complete_batch()
+        # the helper needs its data now, so everything so far is sent
+        self.assertEquals(self.sent, [['view', 'helper']])
+        self.assertEquals(self.received, ['view', 'helper'])
+
+        self.add('more')
+        self.client.complete_batch()
+        self.assertEquals(self.sent, [['view', 'helper'], ['more']])
+        self.failIf(hasattr(self.client, 'batchrequest'))
+
+    def test_cleared_batch_forgets_joins(self):
+        self.client.batch_request()
+        self.client.batch_request()
+        self.client.clear_batch()
+        self.client.batch_request()
+        self.add('a')
+        self.client.complete_batch()
+        self.assertEquals(self.sent, [['a']])
+        self.failIf(hasattr(self.client, 'batchrequest'))
+
+    def test_split_batch(self):
+        split_size = getattr(settings, 'BATCH_SPLIT_SIZE', 0)
+        settings.BATCH_SPLIT_SIZE = 2
+        try:
+            self.client.batch_request()
+            for uri in 'abcde':
+                self.add(uri)
+            self.client.complete_batch()
+        finally:
+            settings.BATCH_SPLIT_SIZE = split_size
+        self.assertEquals(sorted(self.sent), [['a', 'b'], ['c', 'd'], ['e']])
+        self.assertEquals(self.received, list('abcde'))
+
+        # another batch can be opened after
+        self.client.batch_request()
+        self.add('f')
+        self.client.complete_batch()
+        self.assertEquals(self.received, list('abcdef'))
+
+
+class DiscoveryTests(unittest.TestCase):
+
+    def setUp(self):
+        import time
+        from django.core.cache import cache
+        import typepadapp.middleware
+        self.middleware = typepadapp.middleware
+        self.fetch = typepadapp.middleware._fetch_app_and_group
+        self.sleep = time.sleep
+        self.consumer_key = getattr(settings, 'OAUTH_CONSUMER_KEY', None)
+        settings.OAUTH_CONSUMER_KEY = 'discoverytest'
+        self.key = 'discovery:discoverytest'
+        self.lease = 'lease:%s' % self.key
+        self.fetched = []
+        def fetch():
+            value = ('app', 'group', time.time())
+            self.fetched.append(value)
+            return value
+        typepadapp.middleware._fetch_app_and_group = fetch
+        cache.delete(self.key)
+        cache.delete(self.lease)
+
+    def tearDown(self):
+        import time
+        from django.core.cache import cache
+        self.middleware._fetch_app_and_group = self.fetch
+        time.sleep = self.sleep
+        settings.OAUTH_CONSUMER_KEY = self.consumer_key
+        cache.delete(self.key)
+        cache.delete(self.lease)
+
+    def test_lease_holder_fetches_and_caches(self):
+        from django.core.cache import cache
+        value = self.middleware._discover()
+        self.assertEquals(self.fetched, [value])
+        self.assertEquals(cache.get(self.key), value)
+        self.assert_(cache.get(self.lease) is None)
+
+        # other processes use the cached copy
+        self.assertEquals(self.middleware._discover(), value)
+        self.assertEquals(len(self.fetched), 1)
+
+    def test_waits_for_lease_holder(self):
+        import time
+        from django.core.cache import cache
+        cache.add(self.lease, True, 60)
+        value = ('cached app', 'cached group', time.time())
+        sleeps = []
+        def sleep(seconds):
+            # the lease holder caches them while we wait
+            sleeps.append(seconds)
+            cache.set(self.key, value)
+        time.sleep = sleep
+
+        self.assertEquals(self.middleware._discover(), value)
+        self.assertEquals(len(sleeps), 1)
+        self.assertEquals(self.fetched, [])
+
+    def test_does_not_wait_when_told_not_to(self):
+        from django.core.cache import cache
+        cache.add(self.lease, True, 60)
+        self.assert_(self.middleware._discover(wait=False) is None)
+        self.assertEquals(self.fetched, [])
+
+    def test_stale_value_is_used_while_lease_is_held(self):
+        import time
+        from django.core.cache import cache
+        cache.add(self.lease, True, 60)
+        stale = ('app', 'group', time.time() - settings.LONG_TERM_CACHE_PERIOD)
+        cache.set(self.key, stale)
+        self.assertEquals(self.middleware._discover(), stale)
+        self.assertEquals(self.fetched, [])
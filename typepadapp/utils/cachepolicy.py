@@ -0,0 +1,65 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""Cache timeouts and backends for the namespaces of cached values, as
+configured by the `CACHE_POLICIES` setting."""
+
+from django.conf import settings
+import django.core.cache
+
+
+_backends = {}
+
+
+def get_backend(uri):
+    """Returns the Django cache backend for the backend URI ``uri``, sharing
+    one instance for each URI."""
+    try:
+        return _backends[uri]
+    except KeyError:
+        backend = _backends[uri] = django.core.cache.get_cache(uri)
+        return backend
+
+
+def cache_policy(namespace):
+    """Returns the cache backend in which to store the values of the
+    namespace ``namespace``, and the timeout with which to store them.
+
+    The timeout is ``None`` if the backend's default timeout should be
+    used. Namespaces without a policy in `CACHE_POLICIES` use the default
+    Django cache.
+
+    """
+    policy = getattr(settings, 'CACHE_POLICIES', {}).get(namespace) or {}
+    backend = policy.get('backend')
+    if backend is None:
+        backend = django.core.cache.cache
+    else:
+        backend = get_backend(backend)
+    return backend, policy.get('timeout')
@@ -0,0 +1,111 @@
+# Copyright (c) 2009-2010 Six Apart Ltd.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice,
+#   this list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Six Apart Ltd. nor the names of its contributors may
+#   be used to endorse or promote products derived from this software without
+#   specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""Compression of large values stored in the Django cache.
+
+Values whose size is at least the `CACHE_COMPRESS_MIN_SIZE` setting are
+compressed with zlib by `compress()`, and stored flagged as compressed, so
+`decompress()` can tell them from values that were stored as they were.
+
+"""
+
+import cPickle as pickle
+import logging
+import threading
+import zlib
+
+from django.conf import settings
+
+
+log = logging.getLogger(__name__)
+
+ZLIB = 'zlib'
+ZLIB_PICKLE = 'zlib+pickle'
+
+totals = {'values': 0, 'size': 0, 'compressed_size': 0}
+"""The number of values compressed in this process, and their total size
+before and after compression."""
+
+_lock = threading.Lock()
+
+
+def compression_ratio():
+    """Returns the ratio of the total size of the values compressed in this
+    process after compression to their size before it, or ``None`` if no
+    values have been compressed."""
+    if not totals['size']:
+        return None
+    return float(totals['compressed_size']) / totals['size']
+
+
+def compress(value):
+    """Returns ``value`` compressed and flagged as such for storing in the
+    cache, if it is large enough to compress; otherwise, returns ``value``
+    as is.
+
+    Byte strings are compressed directly. Other values are pickled first.
+
+    """
+    min_size = getattr(settings, 'CACHE_COMPRESS_MIN_SIZE', None)
+    if not min_size or value is None:
+        return value
+
+    if isinstance(value, str):
+        flag, data = ZLIB, value
+    else:
+        flag, data = ZLIB_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    if len(data) < min_size:
+        return value
+
+    compressed = zlib.compress(data)
+    _lock.acquire()
+    try:
+        totals['values'] += 1
+        totals['size'] += len(data)
+        totals['compressed_size'] += len(compressed)
+    finally:
+        _lock.release()
+    log.debug("compressed %d bytes to %d (%.2f)" % (len(data), len(compressed),
+        float(len(compressed)) / len(data)))
+
+    if len(compressed) >= len(data):
+        return value
+    return (flag, compressed)
+
+
+def decompress(value):
+    """Returns the original of the ``value`` returned by `compress()`."""
+    if not isinstance(value, tuple) or len(value) != 2:
+        return value
+    flag, data = value
+    if flag == ZLIB:
+        return zlib.decompress(data)
+    if flag == ZLIB_PICKLE:
+        return pickle.loads(zlib.decompress(data))
+    return value
@@ -34,7 +34,6 @@ from urlparse import urlparse
 
 import httplib2
 from django.conf import settings
-import django.core.cache
 from django.core.cache.backends.base import InvalidCacheBackendError
 import django.core.signals
 from django.utils.encoding import smart_unicode
@@ -48,6 +47,8 @@ except InvalidCacheBackendError:
 
 import typepad
 from typepadapp.signals import post_start
+from typepadapp.utils.cachepolicy import cache_policy
+from typepadapp.utils.compression import compress, decompress
 
 
 def configure_logging(**kwargs):
@@ -74,11 +75,17 @@ class DjangoHttplib2Cache(object):
 
     """Adapts the Django low-level caching API to the httplib2 HTTP cache
     interface, passing through the supported calls after prefixing all keys
-    with ``httpcache_``."""
+    with ``httpcache_``.
+
+    Unless a cache is given, responses are stored in the cache backend and
+    with the timeout of the ``httpcache_`` namespace of `CACHE_POLICIES`.
+
+    """
 
     def __init__(self, cache=None):
+        self.timeout = None
         if cache is None:
-            cache = django.core.cache.cache
+            cache, self.timeout = cache_policy('httpcache_')
         self.is_memcached = HAS_MEMCACHED and isinstance(cache, memcached.CacheClass)
         self.cache = cache
 
@@ -89,6 +96,9 @@ class DjangoHttplib2Cache(object):
             return None
 
         val = self.cache.get('httpcache_%s' % (key,))
+        if isinstance(val, tuple):
+            # compressed, so stored as bytes
+            return decompress(val)
         # Django's memcache backend upgrades everything to unicode, so do
         # handle it with care; httplib2 expects data to come back as
         # bytes, not unicode
@@ -103,10 +113,16 @@ class DjangoHttplib2Cache(object):
         if len(key) > 250:
             return
 
+        # Large responses are stored compressed, as bytes
+        value = compress(value)
+
         # Don't store invalid unicode strings.
         if self.is_memcached and isinstance(value, str):
             value = value.decode('utf8', 'replace')
-        self.cache.set('httpcache_%s' % (key,), value)
+        if self.timeout is None:
+            self.cache.set('httpcache_%s' % (key,), value)
+        else:
+            self.cache.set('httpcache_%s' % (key,), value, self.timeout)
 
     def delete(self, key):
         if len(key) > 250:
@@ -144,6 +160,32 @@ typepad.client_factory = configure_typepad_client
 post_start.connect(configure_typepad_client)
 
 
+def discover_application():
+    """Finds the TypePad application and group before any requests need
+    them.
+
+    This is called from the project's ``app.wsgi`` script when the server
+    starts, not on `post_start`, so that management commands and tests
+    importing the models don't talk to the TypePad API.
+
+    """
+    if not getattr(settings, 'DISCOVER_APPLICATION_AT_START', True):
+        return
+    if 'typepadapp.middleware.ApplicationMiddleware' not in settings.MIDDLEWARE_CLASSES:
+        return
+    if not (getattr(settings, 'OAUTH_CONSUMER_KEY', None) and
+            getattr(settings, 'OAUTH_GENERAL_PURPOSE_KEY', None)):
+        return
+
+    from typepadapp.middleware import discover_app_and_group
+    try:
+        discover_app_and_group()
+    except Exception, exc:
+        # the first request will try again
+        log = logging.getLogger('typepadapp.utils.loading')
+        log.error('Could not discover the TypePad application at start: %s' % str(exc))
+
+
 def clear_client_request(signal, sender, **kwargs):
     if hasattr(typepad.client._local, 'client'):
         # Condition this operation; not all requests instantiate a client
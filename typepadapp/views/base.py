@@ -467,6 +467,7 @@ class TypePadView(GenericView):
         allowed, response = self._check_request_allowed(request, *args,
                                                         **kwargs)
         if not allowed:
+            typepad.client.clear_batch()
             return response
 
         self.select_from_typepad(request, *args, **kwargs)